@@ -0,0 +1,204 @@
+import argparse
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+# run as a script only benchmarks/ is on sys.path, the shared loader lives in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lists import load
+
+
+# every case prepares its inputs and returns (function to time, units processed per call, unit name)
+def election_loop(n):
+    environment = load("list 1", "environment")
+    env = environment.Environment([1 / n], n=n, u=n)
+    return env.election, 1, "elections"
+
+
+def election_compact(n):
+    environment = load("list 1", "environment")
+    env = environment.Environment([1 / n], n=n, u=n, compact=True)
+    return env.election, 1, "elections"
+
+
+def elections_batch(n, trials=10000):
+    environment = load("list 1", "environment")
+    env = environment.Environment([1 / n], n=n, u=n)
+    rng = np.random.default_rng(0)
+    return lambda: env.elections(trials, rng=rng), trials, "elections"
+
+
+def elections_direct(n, trials=100000):
+    sampler = load("list 1", "sampler")
+    rng = np.random.default_rng(0)
+    return lambda: sampler.sample_election_lengths(n, [1 / n], trials, rng=rng), trials, "elections"
+
+
+def min_count(k, function, count=20000):
+    mincount = load("list 2", "mincount")
+    hashing = load("list 2", "hashing")
+    bits = 64 if function == "splitmix64" else 128
+    h = hashing.prepare_hash_function(bits, function)
+    multiset = list(range(1, count + 1))
+    return lambda: mincount.min_count(k, h, multiset, bits), count, "elements"
+
+
+def hyperloglog(p, count=1 << 20):
+    estimators = load("list 2", "estimators")
+    values = np.arange(count)
+    return lambda: estimators.HyperLogLog(p, "splitmix64").add_many(values), count, "elements"
+
+
+def probability(model, n, q_points=100):
+    main = load("list 4/nakamoto-gruspan", "main")
+    function = {"nakamoto": main.P_Nakamoto, "grunspan": main.P_Grunspan}[model]
+    q_values = np.linspace(0, 0.5, q_points)
+    return lambda: function(n, q_values), q_points, "evaluations"
+
+
+def confirmation_depth(model, prob, q_points=100):
+    main = load("list 4/nakamoto-gruspan", "main")
+    q_values = np.linspace(0, 0.5, q_points)
+
+    def run():
+        # time the search, not the cache
+        main._depth.cache_clear()
+        main.confirmation_depth(q_values, prob, model)
+
+    return run, q_points, "depths"
+
+
+# name -> (case, list of parameter dictionaries, smaller list for --quick)
+BENCHMARKS = {
+    "list1/election_loop": (election_loop, [{"n": n} for n in [10, 100, 1000]], [{"n": 10}]),
+    "list1/election_compact": (election_compact, [{"n": n} for n in [10, 100, 1000, 10000]], [{"n": 100}]),
+    "list1/elections_batch": (elections_batch, [{"n": n} for n in [10, 100, 1000, 10000]], [{"n": 100}]),
+    "list1/elections_direct": (elections_direct, [{"n": n} for n in [10, 100, 1000, 10000]], [{"n": 100}]),
+    "list2/min_count": (min_count, [{"k": k, "function": f} for f in ["murmur", "sha1", "splitmix64", "mod"]
+                                    for k in [10, 100, 400]], [{"k": 100, "function": "murmur"}]),
+    "list2/hyperloglog": (hyperloglog, [{"p": p} for p in [10, 14]], [{"p": 14}]),
+    "list4/probability": (probability, [{"model": m, "n": n} for m in ["nakamoto", "grunspan"]
+                                        for n in [1, 12, 48, 480]], [{"model": "nakamoto", "n": 48}]),
+    "list4/confirmation_depth": (confirmation_depth, [{"model": m, "prob": r} for m in ["nakamoto", "grunspan"]
+                                                      for r in [0.1, 0.001]], [{"model": "grunspan", "prob": 0.001}]),
+}
+
+
+def measure(run, min_time=0.2, repeat=3) -> float:
+    """
+    :return: best time of a single call over repeat rounds of at least min_time seconds each
+    """
+    start = time.perf_counter()
+    run()
+    once = time.perf_counter() - start
+    calls = max(1, int(min_time / max(once, 1e-9)))
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(calls):
+            run()
+        best = min(best, (time.perf_counter() - start) / calls)
+    return best
+
+
+def profile(run, path, top=10) -> str:
+    profiler = cProfile.Profile()
+    profiler.runcall(run)
+    profiler.dump_stats(path)
+    text = io.StringIO()
+    pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(top)
+    return text.getvalue()
+
+
+def peak_memory(run) -> int:
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def case_key(name: str, params: dict) -> str:
+    return name + "[" + ",".join(f"{key}={value}" for key, value in params.items()) + "]"
+
+
+def run_benchmarks(names=None, quick=False, profile_dir=None, memory=False, min_time=0.2) -> dict:
+    """
+    :param names: prefixes of the benchmarks to run, e.g. list2 or list4/probability, all by default
+    :param quick: only the small parameter set of every benchmark
+    :param profile_dir: directory for a cProfile dump of every case
+    :param memory: record the tracemalloc peak of one call
+    :param min_time: seconds of every timing round
+    :return: dictionary case key -> result
+    """
+    results = dict()
+    for name, (case, grid, quick_grid) in BENCHMARKS.items():
+        if names and not any(name.startswith(prefix) for prefix in names):
+            continue
+        for params in quick_grid if quick else grid:
+            key = case_key(name, params)
+            run, units, unit = case(**params)
+            seconds = measure(run, min_time)
+            result = {"benchmark": name, "params": params, "seconds": seconds, "unit": unit,
+                      "units_per_s": units / seconds}
+            if memory:
+                result["peak_bytes"] = peak_memory(run)
+            if profile_dir is not None:
+                os.makedirs(profile_dir, exist_ok=True)
+                print(profile(run, os.path.join(profile_dir, key.replace("/", "_") + ".prof")))
+            results[key] = result
+            print(f"{key}: {result['units_per_s']:.1f} {unit}/s")
+    return results
+
+
+def compare(baseline: dict, current: dict, tolerance=0.2) -> list:
+    """
+    :return: descriptions of the cases whose throughput dropped by more than tolerance
+    """
+    regressions = []
+    for key, old in baseline.items():
+        new = current.get(key)
+        if new is not None and new["units_per_s"] < old["units_per_s"] * (1 - tolerance):
+            regressions.append(f"{key}: {new['units_per_s']:.1f} {new['unit']}/s, "
+                               f"baseline {old['units_per_s']:.1f} {old['unit']}/s")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks of the hot paths of list 1, list 2 and list 4")
+    parser.add_argument("names", nargs="*", help="benchmark name prefixes, e.g. list1 or list4/probability")
+    parser.add_argument("--output", default=None, help="JSON file for the results")
+    parser.add_argument("--baseline", default=None, help="JSON of an earlier run to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--quick", action="store_true")
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument("--profile", default=None, metavar="DIR", help="write a cProfile dump of every case")
+    parser.add_argument("--memory", action="store_true", help="record the tracemalloc peak of every case")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        for name, (_, grid, _) in BENCHMARKS.items():
+            print(f"{name}: {len(grid)} cases")
+        raise SystemExit(0)
+
+    results = run_benchmarks(args.names, args.quick, args.profile, args.memory, args.min_time)
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            regressions = compare(json.load(file), results, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            raise SystemExit(1)
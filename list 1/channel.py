@@ -0,0 +1,150 @@
+import numpy as np
+
+from environment import Environment
+
+SILENCE = 0
+SINGLE = 1
+COLLISION = 2
+
+
+class Channel:
+    """
+    Slotted radio channel shared by the nodes of one election.
+
+    Every beep is lost independently with probability loss. With collision detection the listeners can tell a
+    collision from silence, without it both sound the same.
+    """
+
+    def __init__(self, collision_detection=False, loss=0.0):
+        assert (0.0 <= loss < 1.0)
+        self.collision_detection = collision_detection
+        self.loss = loss
+
+    def deliver(self, beeps: np.ndarray, rng) -> np.ndarray:
+        return rng.binomial(beeps, 1 - self.loss) if self.loss else beeps
+
+    def observe(self, delivered: np.ndarray) -> np.ndarray:
+        outcome = np.where(delivered == 1, SINGLE, SILENCE)
+        if self.collision_detection:
+            outcome[delivered > 1] = COLLISION
+        return outcome
+
+
+def _first_success(s: np.ndarray, rng) -> np.ndarray:
+    """
+    :param s: success probability of the next len(s[e]) slots of every election, repeated periodically
+    :return: offset of the first successful slot of every election, inf if no slot can succeed
+    """
+    cycle_fail = np.prod(1 - s, axis=1)
+    offsets = np.full(len(s), np.inf)
+    ok = cycle_fail < 1
+    s, cycle_fail = s[ok], cycle_fail[ok]
+    if s.shape[1] == 1:
+        offsets[ok] = rng.geometric(s[:, 0]) - 1
+        return offsets
+    fail_before = np.cumprod(np.concatenate([np.ones((len(s), 1)), 1 - s[:, :-1]], axis=1), axis=1)
+    cdf = np.cumsum(s * fail_before, axis=1) / (1 - cycle_fail)[:, None]
+    cycles = rng.geometric(1 - cycle_fail) - 1
+    position = np.minimum((rng.random(len(s))[:, None] > cdf).sum(axis=1), s.shape[1] - 1)
+    offsets[ok] = cycles * s.shape[1] + position
+    return offsets
+
+
+class AsyncEnvironment(Environment):
+    """
+    Event driven version of Environment with staggered wake-ups, lost beeps and an optional collision detecting
+    channel.
+
+    Slots are numbered as in Environment.election() and a node with wake-up slot w takes part from slot w on. The
+    sorted wake-up times of every election form its time-ordered event queue. Between two events the number of awake
+    nodes does not change, so every running election jumps straight to its first successful slot, drawn from the slot
+    success probabilities, or to its next event if that comes first. With the defaults it draws from the same
+    distribution as Environment.election().
+
+    With adaptive=True, which needs collision detection, the nodes ignore prob_vec: they start with p = 1/2 and halve
+    it after a collision or double it after silence. This is simulated slot by slot for all elections at once.
+    """
+
+    def __init__(self, prob_vec: list, n=0, u=0, wake=None, loss=0.0, collision_detection=False, adaptive=False):
+        super().__init__(prob_vec, n=n, u=u, compact=True)
+        if adaptive and not collision_detection:
+            raise ValueError("the adaptive protocol needs a channel with collision detection")
+        self.channel = Channel(collision_detection, loss)
+        self.adaptive = adaptive
+        # an int draws new wake-up slots from [0, wake] for every election, an array fixes them per node
+        self.wake_spread = wake if isinstance(wake, (int, np.integer)) else None
+        if wake is not None and self.wake_spread is None:
+            self.nodes.wake = np.asarray(wake, dtype=np.int64)
+
+    def election(self) -> int:
+        return int(self.elections(1)[0])
+
+    def _wake_times(self, trials: int, rng) -> np.ndarray:
+        count = int(np.count_nonzero(self.nodes.active))
+        if count == 0:
+            raise ValueError("no active nodes")
+        if self.wake_spread is not None:
+            return np.sort(rng.integers(0, self.wake_spread + 1, size=(trials, count)), axis=1)
+        return np.sort(self.nodes.wake[self.nodes.active])[None, :]
+
+    def elections(self, trials: int, vectorized=True, rng=None) -> np.ndarray:
+        """
+        :param trials: number of independent elections
+        :param vectorized: kept for compatibility with Environment.elections, the simulator is always vectorized
+        :param rng: numpy Generator, by default one seeded from the global np.random state
+        :return: array with the slot count of every election
+        """
+        # seeding from the global state keeps runs reproducible under runner seeding
+        rng = np.random.default_rng(np.random.randint(2 ** 32, dtype=np.uint64)) if rng is None else rng
+        wake = self._wake_times(trials, rng)
+        rows, size = wake.shape
+        # rows are sorted, so shifting row r by r * span keeps the flattened array sorted: it is the time-ordered
+        # event queue of every election at once
+        span = int(wake.max()) + 2
+        flat = np.append((wake + np.arange(rows)[:, None] * span).ravel(), np.inf)
+
+        def row(elections):
+            return elections if rows > 1 else np.zeros(len(elections), dtype=np.int64)
+
+        def awake(elections, t):
+            r = row(elections)
+            return np.searchsorted(flat, r * span + np.minimum(t, span - 1), side="right") - r * size
+
+        def next_wake(elections, t):
+            r = row(elections)
+            i = np.searchsorted(flat, r * span + np.minimum(t, span - 1), side="right")
+            return np.where(i < (r + 1) * size, flat[i] - r * span, np.inf)
+
+        result = np.zeros(trials, dtype=np.int64)
+        running = np.arange(trials)
+        if self.adaptive:
+            return self._adaptive(result, running, awake, rng)
+
+        p_vec = np.asarray(self.prob_Vec, dtype=np.float64)
+        t = np.ones(trials, dtype=np.int64)
+        while running.size:
+            # every election jumps from its current slot to its next wake-up event or its first successful slot
+            a = awake(running, t)[:, None].astype(np.float64)
+            q = p_vec[(t[:, None] + np.arange(len(p_vec))) % len(p_vec)] * (1 - self.channel.loss)
+            s = np.where(a > 0, a * q * np.exp((a - 1) * np.log1p(-q)), 0.0)
+            finish = t + _first_success(s, rng)
+            event = next_wake(running, t)
+            done = finish < event
+            if np.isinf(event[~done]).any():
+                raise RuntimeError("some elections can never finish")
+            result[running[done]] = finish[done]
+            running, t = running[~done], event[~done].astype(np.int64)
+        return result
+
+    def _adaptive(self, result, running, awake, rng):
+        level = np.ones(len(result), dtype=np.int64)
+        t = 1
+        while running.size:
+            beeps = rng.binomial(awake(running, t), np.power(0.5, level[running]))
+            outcome = self.channel.observe(self.channel.deliver(beeps, rng))
+            level[running] = np.maximum(level[running] + (outcome == COLLISION) - (outcome == SILENCE), 1)
+            done = outcome == SINGLE
+            result[running[done]] = t
+            running = running[~done]
+            t += 1
+        return result
@@ -1,16 +1,21 @@
 import random
 
+import numpy as np
+
 from node import Node
+from population import Population
 
 
 class Environment:
-    def __init__(self, prob_vec: list, n=0, u=0):
+    def __init__(self, prob_vec: list, n=0, u=0, compact=False):
         self.prob_Vec = prob_vec
-        self.n, self.nodes = self.generate_nodes(n, u)
+        self.n, self.nodes = self.generate_nodes(n, u, prob_vec if compact else None)
         # print(self.nodes, self.n)
         self.u = u
 
     def election(self) -> int:
+        if isinstance(self.nodes, Population):
+            return self.nodes.election()
         i = 0
         slot = 0
         while slot != 1:
@@ -21,13 +26,48 @@ class Environment:
                 slot += int(n.beep(p))
         return i
 
+    def elections(self, trials: int, vectorized=True, rng=None) -> np.ndarray:
+        """
+        Run many independent elections and return the number of slots each one took.
+
+        With vectorized=True all trials are simulated at once: in every slot the number of beeping nodes of each
+        unfinished election is drawn as Binomial(n, p), which has the same distribution as the per-node loop in
+        election(). With vectorized=False election() is simply called trials times, so both can be compared.
+
+        :param trials: number of independent elections
+        :param vectorized: use the NumPy batch engine instead of the per-node loop
+        :param rng: numpy Generator used by the batch engine
+        :return: array with the slot count of every election
+        """
+        if not vectorized:
+            return np.array([self.election() for _ in range(trials)], dtype=np.int64)
+
+        rng = np.random.default_rng() if rng is None else rng
+        n = len(self.nodes)
+        result = np.zeros(trials, dtype=np.int64)
+        active = np.arange(trials)
+        i = 0
+        while active.size:
+            i += 1
+            p = self.prob_Vec[i % len(self.prob_Vec)]
+            assert (0.0 < p)
+            assert (p < 1.0)
+            slot = rng.binomial(n, p, size=active.size)
+            done = slot == 1
+            result[active[done]] = i
+            active = active[~done]
+        return result
+
     @staticmethod
-    def generate_nodes(n: int, u: int):
+    def generate_nodes(n: int, u: int, prob_vec=None):
+        # with a probability vector the nodes are stored as a compact Population instead of Node objects
         if n == 0:
             assert u >= 2
-            random.seed()
+            # drawn from the global generator, which the runner seeds per chunk
             n = int(random.randint(2, u))
 
+        if prob_vec is not None:
+            return n, Population.uniform(int(n), prob_vec)
         nodes = list()
         for i in range(int(n)):
             nodes.append(Node(i))
@@ -0,0 +1,82 @@
+import numpy as np
+
+
+class Population:
+    """
+    Array backed replacement for a list of Node objects.
+
+    Node ids and per-node state live in contiguous NumPy arrays: the index of the probability schedule used by the
+    node, the slot it wakes up in and whether it takes part at all. A slot is evaluated for all nodes at once.
+    """
+
+    def __init__(self, ids, schedules: list, schedule_index=None, wake=None, active=None):
+        n = len(ids)
+        self.ids = np.asarray(ids)
+        lengths = [len(s) for s in schedules]
+        self.schedules = np.zeros((len(schedules), max(lengths)), dtype=np.float64)
+        for j, s in enumerate(schedules):
+            assert (0.0 < np.min(s))
+            assert (np.max(s) < 1.0)
+            self.schedules[j, :len(s)] = s
+        self.lengths = np.array(lengths, dtype=np.int64)
+        self.schedule_index = np.zeros(n, dtype=np.min_scalar_type(len(schedules) - 1)) \
+            if schedule_index is None else np.asarray(schedule_index)
+        self.wake = np.zeros(n, dtype=np.int64) if wake is None else np.asarray(wake, dtype=np.int64)
+        self.active = np.ones(n, dtype=bool) if active is None else np.asarray(active, dtype=bool)
+
+    @classmethod
+    def uniform(cls, n: int, prob_vec: list):
+        return cls(np.arange(n, dtype=np.min_scalar_type(max(n - 1, 0))), [prob_vec])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __repr__(self):
+        return f"Population of {len(self)} nodes"
+
+    def homogeneous(self, i: int) -> bool:
+        # all nodes take part in slot i with the same probability
+        return len(self.lengths) == 1 and bool(self.active.all()) and int(self.wake.max(initial=0)) <= i
+
+    def probabilities(self, i: int) -> np.ndarray:
+        # probability of every schedule in slot i, then one lookup per node
+        p = self.schedules[np.arange(len(self.lengths)), i % self.lengths][self.schedule_index]
+        p[~self.active | (self.wake > i)] = 0.0
+        return p
+
+    def beeps(self, i: int, rng=None) -> np.ndarray:
+        """
+        :param i: slot number
+        :param rng: numpy Generator, the global np.random state by default
+        :return: boolean mask of the nodes beeping in slot i
+        """
+        rng = np.random if rng is None else rng
+        return rng.random(len(self)) <= self.probabilities(i)
+
+    def election(self, rng=None, with_leader=False):
+        """
+        Run one election over the population, the slot numbering follows Environment.election().
+
+        While every node uses the same probability only the number of beeping nodes is drawn, as Binomial(n, p),
+        and the leader is picked uniformly once a slot succeeds.
+
+        :param rng: numpy Generator, the global np.random state by default so that seeded runs are reproducible
+        :param with_leader: also return the id of the elected node
+        :return: number of slots, or (number of slots, leader id)
+        """
+        # only methods shared by Generator and the np.random module are used below
+        rng = np.random if rng is None else rng
+        i = 0
+        while True:
+            i += 1
+            if self.homogeneous(i):
+                p = self.schedules[0, i % self.lengths[0]]
+                if rng.binomial(len(self), p) != 1:
+                    continue
+                leader = self.ids[rng.choice(len(self))]
+            else:
+                beeping = np.flatnonzero(self.beeps(i, rng))
+                if len(beeping) != 1:
+                    continue
+                leader = self.ids[beeping[0]]
+            return (i, int(leader)) if with_leader else i
@@ -0,0 +1,157 @@
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+# default number of chunks, fixed so that results do not depend on the number of workers
+CHUNKS = 64
+
+
+def _chunks(repeat: int, chunksize):
+    if chunksize is None:
+        chunksize = max(1, -(-repeat // CHUNKS))
+    return [(start, min(start + chunksize, repeat)) for start in range(0, repeat, chunksize)]
+
+
+def _seed_chunk(seed_seq):
+    # seed both the global generators used by Environment/Node and a fresh numpy Generator
+    state = seed_seq.generate_state(2)
+    random.seed(int(state[0]))
+    np.random.seed(int(state[1]))
+    return np.random.default_rng(seed_seq)
+
+
+def _accumulate(results, accumulator):
+    if accumulator is None:
+        return results
+    acc = accumulator()
+    acc.push_many(results)
+    return acc
+
+
+def _run_trial_chunk(trial, start, stop, seed_seq, indexed, args, accumulator):
+    _seed_chunk(seed_seq)
+    if indexed:
+        return _accumulate(np.array([trial(i, *args) for i in range(start, stop)]), accumulator)
+    return _accumulate(np.array([trial(*args) for _ in range(start, stop)]), accumulator)
+
+
+def _run_batch_chunk(batch, start, stop, seed_seq, args, accumulator):
+    rng = _seed_chunk(seed_seq)
+    return _accumulate(np.asarray(batch(stop - start, *args, rng=rng)), accumulator)
+
+
+def _run(job, jobs, workers):
+    if workers == 1 or len(jobs) == 1:
+        return [job(*j) for j in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(job, *zip(*jobs)))
+
+
+def _gather(results, accumulator, merged):
+    if accumulator is None:
+        return np.concatenate(results) if results else np.array([])
+    if not merged:
+        return results
+    total = accumulator()
+    for acc in results:
+        total.merge(acc)
+    return total
+
+
+def run_trials(trial, repeat: int, workers=None, chunksize=None, seed=None, indexed=False, args=(),
+               accumulator=None, merged=True):
+    """
+    Run a trial function repeat times across a process pool and gather the results into one array.
+
+    Every chunk of trials gets its own SeedSequence child, which seeds random, np.random and a Generator, so results
+    depend only on seed and chunksize, never on the number of workers. The trial must be a module level function.
+
+    :param trial: function returning the result of one trial
+    :param repeat: number of trials
+    :param workers: number of processes, defaults to the number of cores
+    :param chunksize: number of trials per chunk
+    :param seed: entropy for the root SeedSequence
+    :param indexed: pass the trial index as the first argument
+    :param args: extra arguments passed to every trial
+    :param accumulator: class like stats.RunningStats, each chunk is fed into one instead of being sent back
+    :param merged: merge the per-chunk accumulators into one
+    :return: array with the results in trial order, or the accumulator(s)
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = _chunks(repeat, chunksize)
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    jobs = [(trial, start, stop, s, indexed, args, accumulator) for (start, stop), s in zip(chunks, seeds)]
+    return _gather(_run(_run_trial_chunk, jobs, workers), accumulator, merged)
+
+
+def run_batches(batch, repeat: int, workers=None, chunksize=None, seed=None, args=(), accumulator=None, merged=True):
+    """
+    Same as run_trials, but for vectorized engines called as batch(count, *args, rng=rng) once per chunk.
+
+    :param batch: function returning an array of count results, e.g. Environment.elections
+    :param repeat: number of trials
+    :param workers: number of processes, defaults to the number of cores
+    :param chunksize: number of trials per chunk
+    :param seed: entropy for the root SeedSequence
+    :param args: extra arguments passed to every call
+    :param accumulator: class like stats.RunningStats, each chunk is fed into one instead of being sent back
+    :param merged: merge the per-chunk accumulators into one
+    :return: array with the results in trial order, or the accumulator(s)
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = _chunks(repeat, chunksize)
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    jobs = [(batch, start, stop, s, args, accumulator) for (start, stop), s in zip(chunks, seeds)]
+    return _gather(_run(_run_batch_chunk, jobs, workers), accumulator, merged)
+
+
+def run_until(batch, accumulator, rel_error=None, half_width=None, confidence=0.95, batch_size=1000,
+              max_trials=10 ** 8, workers=None, seed=None, args=(), vectorized=True):
+    """
+    Run trials in rounds until the confidence interval of the mean is narrow enough.
+
+    After every round the number of trials still needed is estimated from the current variance, and the next round
+    runs that many (at least batch_size, at most as many as have been run so far).
+
+    :param batch: batch function as in run_batches, or a trial function as in run_trials if vectorized is False
+    :param accumulator: stats.RunningStats or stats.SuccessRate
+    :param rel_error: target half width of the interval relative to the mean; while the mean is 0 only half_width
+        applies, without it an interval of non-zero width raises ValueError
+    :param half_width: target absolute half width of the interval
+    :param confidence: confidence level of the interval
+    :param batch_size: size of the first and smallest round
+    :param max_trials: stop after this many trials even if the target is not met
+    :param workers: number of processes, defaults to the number of cores
+    :param seed: entropy for the root SeedSequence, every round uses a different child
+    :param args: extra arguments passed to every call
+    :param vectorized: batch is a vectorized engine
+    :return: merged accumulator, its count is the number of trials used
+    """
+    assert rel_error is not None or half_width is not None
+    run = run_batches if vectorized else run_trials
+    total = accumulator()
+    size = batch_size
+    rounds = 0
+    while total.count < max_trials:
+        round_seed = None if seed is None else [seed, rounds]
+        total.merge(run(batch, min(size, max_trials - total.count), workers=workers, seed=round_seed, args=args,
+                        accumulator=accumulator))
+        rounds += 1
+
+        low, high = total.interval(confidence)
+        half = (high - low) / 2
+        targets = [] if half_width is None else [half_width]
+        # no interval is narrow relative to a zero mean
+        if rel_error is not None and total.mean != 0:
+            targets.append(rel_error * abs(total.mean))
+        if not targets and half > 0:
+            raise ValueError(f"the mean is 0 after {total.count} trials, rel_error cannot be met, pass half_width")
+        target = min(targets, default=0.0)
+        if half <= target:
+            break
+        needed = total.count * (half / target) ** 2 if target > 0 else 2 * total.count
+        size = int(min(max(needed - total.count, batch_size), total.count))
+    return total
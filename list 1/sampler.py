@@ -0,0 +1,97 @@
+import numpy as np
+
+
+def slot_success_probabilities(n, prob_vec: list) -> np.ndarray:
+    """
+    Probability that exactly one of n nodes beeps in each slot of one cycle of prob_vec.
+
+    The number of beeping nodes in a slot with probability p is Binomial(n, p), so the slot succeeds with probability
+    n * p * (1 - p)^(n - 1). Slots are returned in the order Environment.election() visits them: slot i uses
+    prob_vec[i % len(prob_vec)] starting from i = 1.
+
+    :param n: number of nodes, a scalar or an array
+    :param prob_vec: probability vector shared by all nodes
+    :return: array of shape n.shape + (len(prob_vec),)
+    """
+    p = np.asarray(prob_vec, dtype=np.float64)
+    p = p[np.arange(1, len(p) + 1) % len(p)]
+    n = np.asarray(n, dtype=np.float64)[..., None]
+    return n * p * np.exp((n - 1) * np.log1p(-p))
+
+
+def sample_election_lengths(n: int, prob_vec: list, size: int, rng=None) -> np.ndarray:
+    """
+    Draw election lengths straight from the slot success probabilities instead of simulating the slots.
+
+    With a single probability the length is geometric. For a longer vector the number of failed full cycles is
+    geometric and the slot inside the last cycle is drawn from its conditional distribution.
+
+    :param n: number of nodes
+    :param prob_vec: probability vector shared by all nodes
+    :param size: number of elections to draw
+    :param rng: numpy Generator
+    :return: array with the slot count of every election
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    s = slot_success_probabilities(n, prob_vec)
+    if len(s) == 1:
+        return rng.geometric(s[0], size=size)
+
+    first_success = np.cumprod(np.concatenate(([1.0], 1 - s[:-1]))) * s
+    cycle_success = first_success.sum()
+    cycles = rng.geometric(cycle_success, size=size) - 1
+    position = rng.choice(len(s), size=size, p=first_success / cycle_success) + 1
+    return cycles * len(s) + position
+
+
+def _moments(n: int, prob_vec: list):
+    s = slot_success_probabilities(n, prob_vec)
+    length = len(s)
+    first_success = np.cumprod(np.concatenate(([1.0], 1 - s[:-1]))) * s
+    fail = 1 - first_success.sum()
+    j = np.arange(1, length + 1)
+    # sums of fail^c, c * fail^c and c^2 * fail^c over all failed cycles c
+    s0 = 1 / (1 - fail)
+    s1 = fail / (1 - fail) ** 2
+    s2 = fail * (1 + fail) / (1 - fail) ** 3
+    first = np.sum(first_success * (length * s1 + j * s0))
+    second = np.sum(first_success * (length ** 2 * s2 + 2 * length * j * s1 + j ** 2 * s0))
+    return first, second
+
+
+def expected_election_length(n: int, prob_vec: list) -> float:
+    """
+    Exact expected number of slots of an election.
+
+    :param n: number of nodes
+    :param prob_vec: probability vector shared by all nodes
+    :return: E[slots]
+    """
+    return float(_moments(n, prob_vec)[0])
+
+
+def election_length_variance(n: int, prob_vec: list) -> float:
+    """
+    Exact variance of the number of slots of an election.
+
+    :param n: number of nodes
+    :param prob_vec: probability vector shared by all nodes
+    :return: Var[slots]
+    """
+    first, second = _moments(n, prob_vec)
+    return float(second - first ** 2)
+
+
+def election_length_cdf(n, prob_vec: list, m: int) -> np.ndarray:
+    """
+    Exact probability that an election finishes within m slots.
+
+    :param n: number of nodes, a scalar or an array
+    :param prob_vec: probability vector shared by all nodes
+    :param m: number of slots
+    :return: P[slots <= m] for every n
+    """
+    s = slot_success_probabilities(n, prob_vec)
+    cycles, rest = divmod(m, s.shape[-1])
+    log_fail = np.log1p(-s)
+    return 1 - np.exp(cycles * log_fail.sum(axis=-1) + log_fail[..., :rest].sum(axis=-1))
@@ -0,0 +1,145 @@
+from collections import Counter
+from statistics import NormalDist
+
+import numpy as np
+
+
+def z_value(confidence: float) -> float:
+    return NormalDist().inv_cdf((1 + confidence) / 2)
+
+
+class RunningStats:
+    """
+    Single pass accumulator of trial results: Welford mean and variance plus a histogram of the observed values.
+
+    The histogram is meant for discrete results such as slot counts, so its size is the number of distinct values
+    and not the number of trials. Accumulators built on different workers can be merged.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.histogram = Counter()
+
+    def push(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        self.histogram[x] += 1
+
+    def push_many(self, data):
+        data = np.asarray(data)
+        if data.size == 0:
+            return
+        other = RunningStats()
+        other.count = data.size
+        other.mean = float(data.mean())
+        other.m2 = float(((data - other.mean) ** 2).sum())
+        values, counts = np.unique(data, return_counts=True)
+        other.histogram = Counter(dict(zip(values.tolist(), counts.tolist())))
+        self.merge(other)
+
+    def merge(self, other):
+        # Chan et al. parallel update of the mean and the sum of squared deviations
+        count = self.count + other.count
+        if count == 0:
+            return self
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+        self.histogram.update(other.histogram)
+        return self
+
+    @property
+    def variance(self) -> float:
+        # population variance, same as np.var
+        return self.m2 / self.count if self.count else float("nan")
+
+    @property
+    def sample_variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else float("nan")
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self.variance))
+
+    def quantile(self, q: float):
+        """
+        :param q: quantile in [0, 1]
+        :return: smallest observed value x with P[X <= x] >= q
+        """
+        target = q * self.count
+        seen = 0
+        for value in sorted(self.histogram):
+            seen += self.histogram[value]
+            if seen >= target:
+                return value
+        return float("nan")
+
+    def interval(self, confidence=0.95):
+        """
+        :param confidence: confidence level
+        :return: normal approximation confidence interval of the mean
+        """
+        half = z_value(confidence) * np.sqrt(self.sample_variance / self.count) if self.count > 1 else float("inf")
+        return float(self.mean - half), float(self.mean + half)
+
+    def __repr__(self):
+        return f"RunningStats(count={self.count}, mean={self.mean}, variance={self.variance})"
+
+
+class SuccessRate:
+    """
+    Single pass accumulator of boolean trial results with a Wilson score confidence interval.
+    """
+
+    def __init__(self):
+        self.successes = 0
+        self.count = 0
+
+    def push(self, x):
+        self.successes += int(bool(x))
+        self.count += 1
+
+    def push_many(self, data):
+        data = np.asarray(data)
+        self.successes += int(np.count_nonzero(data))
+        self.count += data.size
+
+    def merge(self, other):
+        self.successes += other.successes
+        self.count += other.count
+        return self
+
+    @property
+    def rate(self) -> float:
+        return self.successes / self.count if self.count else float("nan")
+
+    @property
+    def mean(self) -> float:
+        return self.rate
+
+    @property
+    def variance(self) -> float:
+        # population variance of the 0/1 results, same as np.var
+        return self.rate * (1 - self.rate)
+
+    def interval(self, confidence=0.95):
+        """
+        :param confidence: confidence level
+        :return: Wilson score interval of the success rate
+        """
+        if self.count == 0:
+            return 0.0, 1.0
+        z = z_value(confidence)
+        p = self.rate
+        denominator = 1 + z * z / self.count
+        center = (p + z * z / (2 * self.count)) / denominator
+        half = z * np.sqrt(p * (1 - p) / self.count + z * z / (4 * self.count * self.count)) / denominator
+        return float(center - half), float(center + half)
+
+    def __repr__(self):
+        return f"SuccessRate({self.successes}/{self.count})"
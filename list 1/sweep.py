@@ -0,0 +1,84 @@
+import hashlib
+import itertools
+import json
+import os
+from functools import partial
+
+import numpy as np
+
+from environment import Environment
+from runner import run_batches, run_trials
+from sampler import sample_election_lengths
+from task2 import prepare_almost_optimal_p_vec
+
+CACHE_DIR = "output/sweep"
+
+
+def one_over_n(n, u):
+    return [1 / n]
+
+
+def almost_optimal(n, u):
+    return prepare_almost_optimal_p_vec(u)
+
+
+SCHEDULES = {
+    "one_over_n": one_over_n,
+    "almost_optimal": almost_optimal,
+}
+
+
+def cell_key(n: int, u: int, schedule: str, trials: int, seed: int, engine: str) -> str:
+    params = dict(n=n, u=u, schedule=schedule, trials=trials, seed=seed, engine=engine)
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def run_cell(n: int, u: int, schedule: str, trials: int, seed: int, engine="batch", workers=None) -> np.ndarray:
+    """
+    :return: slot counts of trials elections with n nodes, universe u and the named probability schedule
+    """
+    p_vec = SCHEDULES[schedule](n, u)
+    # every cell has its own seed, so a cell gives the same data whichever other cells are computed with it
+    cell_seed = [seed, int(cell_key(n, u, schedule, trials, seed, engine)[:8], 16)]
+    if engine == "direct":
+        return run_batches(partial(sample_election_lengths, n, p_vec), trials, workers=workers, seed=cell_seed)
+    env = Environment(p_vec, n=n, u=u)
+    if engine == "batch":
+        return run_batches(env.elections, trials, workers=workers, seed=cell_seed)
+    return run_trials(env.election, trials, workers=workers, seed=cell_seed)
+
+
+def sweep(ns: list, us: list, schedules: list, trials: int, seed=0, engine="batch", workers=None,
+          cache_dir=CACHE_DIR) -> dict:
+    """
+    Run leader elections over the grid ns x us x schedules, reusing grid points cached on disk.
+
+    Every grid point is stored in cache_dir under a key made of its parameters, the number of trials, the seed and
+    the engine, so only points that were never computed with these settings are simulated.
+
+    :param ns: numbers of nodes
+    :param us: universe sizes
+    :param schedules: names of probability schedules from SCHEDULES
+    :param trials: number of elections per grid point
+    :param seed: seed of the sweep
+    :param engine: loop, batch or direct
+    :param workers: number of processes, defaults to the number of cores
+    :param cache_dir: directory of the result cache, None disables it
+    :return: dictionary (n, u, schedule) -> array of slot counts
+    """
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+    results = dict()
+    for n, u, schedule in itertools.product(ns, us, schedules):
+        path = None
+        if cache_dir is not None:
+            path = os.path.join(cache_dir, f"{cell_key(n, u, schedule, trials, seed, engine)}.npz")
+            if os.path.exists(path):
+                results[(n, u, schedule)] = np.load(path)["results"]
+                continue
+        data = run_cell(n, u, schedule, trials, seed, engine, workers)
+        if path is not None:
+            params = dict(n=n, u=u, schedule=schedule, trials=trials, seed=seed, engine=engine)
+            np.savez(path, results=data, params=json.dumps(params))
+        results[(n, u, schedule)] = data
+    return results
@@ -3,9 +3,12 @@ import numpy as np
 import random
 
 from environment import Environment
+from runner import run_trials
 
 REPEAT = 1000
 TASK = 2
+WORKERS = None
+SEED = None
 
 
 def prepare_almost_optimal_p_vec(u):
@@ -59,17 +62,25 @@ def task2case4():
 
 
 # Task 2
-def task2(case_number=1):
+def task2_data(case_number=1, repeat=REPEAT, workers=WORKERS, seed=SEED) -> dict:
     cases = [task2case1, task2case2, task2case3, task2case4]
-    data = list()
-    for _ in range(REPEAT):
-        result = cases[case_number - 1]()
-        data.append(result)
-    plt.hist(data, bins=len(set(data)))
+    slots = run_trials(cases[case_number - 1], repeat, workers=workers, seed=seed)
+    return {"case_number": case_number, "slots": slots}
+
+
+def plot_task2(data) -> list:
+    slots = data["slots"].tolist()
+    fig, ax = plt.subplots()
+    ax.hist(slots, bins=len(set(slots)))
     # SET PERCENTAGE INSTEAD OF NUMBERS
-    # plt.hist(data, weights=np.ones(len(data)) / len(data))
-    # plt.gca().yaxis.set_major_formatter(PercentFormatter(1))
-    plt.title(f"TASK {TASK} CASE {case_number}, {REPEAT} trials")
+    # ax.hist(slots, weights=np.ones(len(slots)) / len(slots))
+    # ax.yaxis.set_major_formatter(PercentFormatter(1))
+    ax.set_title(f"TASK {TASK} CASE {data['case_number']}, {len(slots)} trials")
+    return [fig]
+
+
+def task2(case_number=1):
+    plot_task2(task2_data(case_number))
     plt.show()
 
 
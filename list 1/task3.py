@@ -1,43 +1,89 @@
+from functools import partial
+
 import matplotlib.pyplot as plt
 import numpy as np
 
 from environment import Environment
+from runner import run_batches, run_trials, run_until
+from sampler import sample_election_lengths, expected_election_length, election_length_variance
+from stats import RunningStats
 
 # CONFIG
 TASK = 3
 REPEAT = 1000
+# loop, batch or direct
+ENGINE = "direct"
+WORKERS = None
+SEED = None
+# relative error of E[slots] at 95% confidence for task3_adaptive
+TARGET_REL_ERROR = 0.005
 
 
 # Task 3
-def task3():
-    ev = list()
-    var = list()
-    for j in range(1000):
-        data = list()
-        for i in range(REPEAT):
-            u = 100
-            n = u
-            env = Environment([1 / n], n=n, u=u)
-            result = env.election()
-            data.append(result)
-        ev.append(sum([k * l for k, l in [[x, data.count(x) / REPEAT] for x in set(data)]]))
-        var.append(np.var(data))
-
-    plt.title(f"TASK 3 expected value {len(ev)} data points")
-    plt.plot(ev)
-    plt.hlines(y=np.array(ev).mean(), xmin=0, xmax=len(ev), linewidth=2, color='r')
-    plt.show()
+def task3_data(repeat=REPEAT, engine=ENGINE, workers=WORKERS, seed=SEED) -> dict:
+    u = 100
+    n = u
+    env = Environment([1 / n], n=n, u=u)
+    # one chunk per data point, every chunk is reduced to a RunningStats by its worker
+    options = dict(workers=workers, chunksize=repeat, seed=seed, accumulator=RunningStats, merged=False)
+    if engine == "direct":
+        stats = run_batches(partial(sample_election_lengths, n, [1 / n]), 1000 * repeat, **options)
+    elif engine == "batch":
+        stats = run_batches(env.elections, 1000 * repeat, **options)
+    else:
+        stats = run_trials(env.election, 1000 * repeat, **options)
+    total = RunningStats()
+    for s in stats:
+        total.merge(s)
+    low, high = total.interval()
+    return {"ev": np.array([s.mean for s in stats]), "var": np.array([s.variance for s in stats]),
+            "low": low, "high": high, "median": total.quantile(0.5), "q99": total.quantile(0.99),
+            "exact_ev": expected_election_length(n, [1 / n]), "exact_var": election_length_variance(n, [1 / n])}
+
+
+def plot_task3(data) -> list:
+    figures = []
+    for key, name in [("ev", "expected value"), ("var", "variance")]:
+        values = data[key]
+        fig, ax = plt.subplots()
+        ax.set_title(f"TASK 3 {name} {len(values)} data points")
+        ax.plot(values)
+        ax.hlines(y=values.mean(), xmin=0, xmax=len(values), linewidth=2, color='r')
+        figures.append(fig)
+    return figures
+
 
-    plt.title(f"TASK 3 variance {len(var)} data points")
-    plt.plot(var)
-    plt.hlines(y=np.array(var).mean(), xmin=0, xmax=len(var), linewidth=2, color='r')
+def task3():
+    data = task3_data()
+    plot_task3(data)
     plt.show()
 
-    pp = np.array(ev).mean()
+    pp = data["ev"].mean()
     p = 1 / pp
 
     print(pp)
-    print(np.array(var).mean(), (1 - p) / (p * p))
+    print(data["var"].mean(), (1 - p) / (p * p))
+    print(f"95% CI of E[slots]: {(data['low'], data['high'])}, median: {data['median']}, 99%: {data['q99']}")
+    print(f"exact: {data['exact_ev']} {data['exact_var']}")
+
+
+def task3_adaptive_data(rel_error=TARGET_REL_ERROR, engine=ENGINE, workers=WORKERS, seed=SEED) -> dict:
+    u = 100
+    n = u
+    if engine == "direct":
+        batch = partial(sample_election_lengths, n, [1 / n])
+    else:
+        batch = Environment([1 / n], n=n, u=u).elections
+    stats = run_until(batch, RunningStats, rel_error=rel_error, workers=workers, seed=seed)
+    low, high = stats.interval()
+    return {"mean": stats.mean, "low": low, "high": high, "count": stats.count,
+            "exact": expected_election_length(n, [1 / n])}
+
+
+def task3_adaptive():
+    data = task3_adaptive_data()
+    print(f"E[slots] = {data['mean']} in [{data['low']}, {data['high']}] after {data['count']} trials")
+    print(f"exact: {data['exact']}")
 
 
 if __name__ == '__main__':
@@ -1,11 +1,20 @@
+
 import numpy as np
 import matplotlib.pyplot as plt
 
 from environment import Environment
+from runner import run_trials, run_until
+from sampler import election_length_cdf
+from stats import SuccessRate
 
 # CONFIG
 TASK = 4
 REPEAT = 10000
+DIRECT = True
+WORKERS = None
+SEED = None
+# half width of P[res <= len(p_vec)] at 95% confidence for task4_adaptive
+TARGET_HALF_WIDTH = 0.005
 
 
 def prepare_almost_optimal_p_vec(u):
@@ -26,22 +35,73 @@ def experiment(i):
     return res <= len(p_vec)
 
 
+def experiment_direct(repeat, rng):
+    # same as [experiment(i) for i in range(repeat)], drawn from the exact success probability of every n
+    u = 1000
+    p_vec = prepare_almost_optimal_p_vec(u)
+    n = np.arange(repeat)
+    if repeat:
+        n[0] = rng.integers(2, u + 1)
+    return rng.random(repeat) < election_length_cdf(n, p_vec, len(p_vec))
+
+
+def experiment_batch(count, rng):
+    # count experiments with n drawn uniformly from range(REPEAT), the same mixture as one task4 data point
+    u = 1000
+    p_vec = prepare_almost_optimal_p_vec(u)
+    n = rng.integers(0, REPEAT, size=count)
+    n[n == 0] = rng.integers(2, u + 1, size=np.count_nonzero(n == 0))
+    return rng.random(count) < election_length_cdf(n, p_vec, len(p_vec))
+
+
 # Task 4
-def task4():
+def task4_data(repeat=REPEAT, direct=DIRECT, workers=WORKERS, seed=SEED) -> dict:
     ev = list()
     var = list()
+    total = SuccessRate()
+    rng = np.random.default_rng(seed)
     for j in range(100):
-        data = list()
-        for i in range(REPEAT):
-            data.append(experiment(i))
-        ev.append(sum([k * l for k, l in [[x, data.count(x) / REPEAT] for x in set(data)]]))
-        var.append(np.var(data))
-    plt.plot(ev)
-    plt.show()
-    plt.plot(var)
+        if direct:
+            rate = SuccessRate()
+            rate.push_many(experiment_direct(repeat, rng))
+        else:
+            chunk_seed = None if seed is None else [seed, j]
+            rate = run_trials(experiment, repeat, workers=workers, seed=chunk_seed, indexed=True,
+                              accumulator=SuccessRate)
+        total.merge(rate)
+        ev.append(rate.rate)
+        var.append(rate.variance)
+    low, high = total.interval()
+    return {"ev": np.array(ev), "var": np.array(var), "low": low, "high": high}
+
+
+def plot_task4(data) -> list:
+    figures = []
+    for key in ["ev", "var"]:
+        fig, ax = plt.subplots()
+        ax.plot(data[key])
+        figures.append(fig)
+    return figures
+
+
+def task4():
+    data = task4_data()
+    plot_task4(data)
     plt.show()
-    print(np.array(ev).mean())
-    print(f"min: {np.min(np.array(ev))}")
+    print(data["ev"].mean())
+    print(f"min: {np.min(data['ev'])}")
+    print(f"95% CI: {(data['low'], data['high'])}")
+
+
+def task4_adaptive_data(half_width=TARGET_HALF_WIDTH, workers=WORKERS, seed=SEED) -> dict:
+    rate = run_until(experiment_batch, SuccessRate, half_width=half_width, workers=workers, seed=seed)
+    low, high = rate.interval()
+    return {"rate": rate.rate, "low": low, "high": high, "count": rate.count}
+
+
+def task4_adaptive():
+    data = task4_adaptive_data()
+    print(f"P[res <= len(p_vec)] = {data['rate']} in [{data['low']}, {data['high']}] after {data['count']} trials")
 
 
 if __name__ == '__main__':
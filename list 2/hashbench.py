@@ -0,0 +1,149 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+from hashing import HASH_FUNCTIONS, hash_array, prepare_hash_function
+from mincount import min_count_array
+
+HASH_LENGTHS = [8, 16, 32, 64, 96, 128]
+
+
+def _as_bits(hashes: np.ndarray, bits: int) -> np.ndarray:
+    # (n, bits) array of 0/1, most significant bit first
+    words = hashes[:, None] if hashes.dtype.names is None else np.stack([hashes[n] for n in hashes.dtype.names], 1)
+    unpacked = np.unpackbits(words.astype(">u8").view(np.uint8), axis=1)
+    return unpacked[:, unpacked.shape[1] - bits:]
+
+
+def throughput(function: str, bits: int, count=2000, repeat=3) -> dict:
+    """
+    Hashes per second and MB of keys per second of the scalar and the batched hash on the keys 1..count, which is
+    the kind of multiset min_count sees.
+    """
+    h = prepare_hash_function(bits, function)
+    values = np.arange(1, count + 1, dtype=np.int64)
+    key_bytes = int(values.sum()) if function not in ["mod", "splitmix64"] else 8 * count
+    result = dict()
+    for mode, run in [("scalar", lambda: [h(x) for x in values.tolist()]), ("batched", lambda: h.batch(values))]:
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            best = min(best, time.perf_counter() - start)
+        result[mode] = {"hashes_per_s": count / best, "mb_per_s": key_bytes / best / 1e6}
+    result["speedup"] = result["batched"]["hashes_per_s"] / result["scalar"]["hashes_per_s"]
+    return result
+
+
+def avalanche(function: str, bits: int, samples=2000, seed=0) -> dict:
+    """
+    Flip every bit of 64 bit keys and measure how often every output bit flips, ideally half of the time.
+    """
+    rng = np.random.default_rng(seed)
+    keys = rng.integers(0, 2 ** 62, size=samples, dtype=np.int64)
+    base = _as_bits(hash_array(keys, bits, function, "int64"), bits)
+    flips = np.zeros((63, bits))
+    for i in range(63):
+        changed = _as_bits(hash_array(keys ^ (1 << i), bits, function, "int64"), bits)
+        flips[i] = (changed != base).mean(axis=0)
+    return {"mean_flip": float(flips.mean()), "max_bias": float(np.abs(flips - 0.5).max())}
+
+
+def bucket_chi_square(function: str, bits: int, count=20000, buckets=256) -> dict:
+    """
+    Chi-square statistic of the top bits of the hashes of 1..count spread over buckets, with its normal z-score.
+    """
+    buckets = min(buckets, 2 ** bits)
+    top = int(np.log2(buckets))
+    hashes = hash_array(np.arange(1, count + 1), bits, function)
+    first = hashes if hashes.dtype.names is None else hashes[hashes.dtype.names[0]]
+    first_bits = bits if hashes.dtype.names is None else bits - 64 * (len(hashes.dtype.names) - 1)
+    index = (first >> np.uint64(first_bits - top)).astype(np.int64) if first_bits >= top else first.astype(np.int64)
+    observed = np.bincount(index, minlength=buckets)
+    expected = count / buckets
+    chi2 = float(((observed - expected) ** 2 / expected).sum())
+    df = buckets - 1
+    return {"chi2": chi2, "df": df, "z": (chi2 - df) / np.sqrt(2 * df)}
+
+
+def estimator_error(function: str, bits: int, k=16, n=1000, runs=50) -> dict:
+    """
+    Relative bias and RMSE of min_count_array(k) over runs disjoint multisets of n distinct elements.
+    """
+    h = prepare_hash_function(bits, function)
+    ratios = np.array([min_count_array(k, h.batch(np.arange(r * n + 1, (r + 1) * n + 1)), bits) / n
+                       for r in range(runs)])
+    return {"bias": float(ratios.mean() - 1), "rmse": float(np.sqrt(((ratios - 1) ** 2).mean()))}
+
+
+def run_benchmark(functions=None, lengths=None, quick=False) -> dict:
+    functions = HASH_FUNCTIONS if functions is None else functions
+    lengths = HASH_LENGTHS if lengths is None else lengths
+    scale = 10 if quick else 1
+    results = dict()
+    for function in functions:
+        for bits in lengths:
+            if function == "splitmix64" and bits > 64:
+                continue
+            results[f"{function}/{bits}"] = {
+                "function": function,
+                "bits": bits,
+                "throughput": throughput(function, bits, count=2000 // scale),
+                "avalanche": avalanche(function, bits, samples=2000 // scale),
+                "chi_square": bucket_chi_square(function, bits, count=20000 // scale),
+                "estimator": estimator_error(function, bits, runs=50 // scale),
+            }
+            print(f"{function} {bits} done")
+    return results
+
+
+def compare(baseline: dict, current: dict, tolerance=0.2) -> list:
+    """
+    :return: descriptions of the entries whose batched throughput dropped or whose RMSE grew by more than tolerance
+    """
+    regressions = []
+    for key, old in baseline.items():
+        new = current.get(key)
+        if new is None:
+            continue
+        old_speed = old["throughput"]["batched"]["hashes_per_s"]
+        new_speed = new["throughput"]["batched"]["hashes_per_s"]
+        if new_speed < old_speed * (1 - tolerance):
+            regressions.append(f"{key}: batched throughput {new_speed:.0f}/s, baseline {old_speed:.0f}/s")
+        if new["estimator"]["rmse"] > old["estimator"]["rmse"] * (1 + tolerance):
+            regressions.append(f"{key}: rmse {new['estimator']['rmse']:.4f}, baseline {old['estimator']['rmse']:.4f}")
+    return regressions
+
+
+def cheapest(results: dict, max_rmse: float):
+    """
+    :return: key of the fastest batched hash whose MinCount RMSE stays below max_rmse
+    """
+    good = [key for key, r in results.items() if r["estimator"]["rmse"] <= max_rmse]
+    return max(good, key=lambda key: results[key]["throughput"]["batched"]["hashes_per_s"], default=None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput and quality benchmark of the MinCount hash families")
+    parser.add_argument("--functions", nargs="*", default=None)
+    parser.add_argument("--lengths", nargs="*", type=int, default=None)
+    parser.add_argument("--output", default="output/hashbench.json")
+    parser.add_argument("--baseline", default=None, help="JSON of an earlier run to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--max-rmse", type=float, default=0.3)
+    parser.add_argument("--quick", action="store_true")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.functions, args.lengths, args.quick)
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+    print(f"cheapest hash with rmse <= {args.max_rmse}: {cheapest(results, args.max_rmse)}")
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            regressions = compare(json.load(file), results, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            raise SystemExit(1)
@@ -0,0 +1,166 @@
+import hashlib
+
+import mmh3
+import numpy as np
+from farmhash import FarmHash128
+from cityhash import CityHash128
+import xxhash
+
+# digest functions returning the hash as big-endian bytes, int.from_bytes(digest, 'big') is the hash value
+_murmur = getattr(mmh3, "mmh3_x64_128_digest", None) or (lambda b: mmh3.hash_bytes(bytes(b)))
+DIGESTS = {
+    "sha3_256": lambda b: hashlib.sha3_256(b).digest(),
+    "murmur": lambda b: _murmur(b)[::-1],
+    "xxhash": lambda b: xxhash.xxh128(b).digest(),
+    "sha1": lambda b: hashlib.sha1(b).digest(),
+    "md5": lambda b: hashlib.md5(b).digest(),
+    "farmhash": lambda b: FarmHash128(bytes(b)).to_bytes(16, "big"),
+    "cityhash": lambda b: CityHash128(bytes(b)).to_bytes(16, "big"),
+}
+# families computed with NumPy arithmetic directly on the integer values
+ARITHMETIC = ["mod", "splitmix64"]
+HASH_FUNCTIONS = list(DIGESTS) + ARITHMETIC
+
+
+def hash_words(bits: int) -> int:
+    return max(1, -(-bits // 64))
+
+
+def hash_dtype(bits: int) -> np.dtype:
+    """
+    Fixed width representation of bits-long hashes: uint64 up to 64 bits, otherwise a structured dtype of uint64
+    words ordered from the most significant one, so sorting compares hashes as integers.
+    """
+    if bits <= 64:
+        return np.dtype(np.uint64)
+    return np.dtype([(f"w{i}", np.uint64) for i in range(hash_words(bits))])
+
+
+def from_words(words: np.ndarray, bits: int) -> np.ndarray:
+    """
+    :param words: (n, hash_words(bits)) uint64 array, most significant word first, modified in place
+    :param bits: length of the hashes, higher bits are dropped
+    :return: fixed width array as returned by hash_array
+    """
+    top = bits - 64 * (words.shape[1] - 1)
+    if top < 64:
+        words[:, 0] &= np.uint64((1 << top) - 1)
+    if words.shape[1] == 1:
+        return words[:, 0].copy()
+    result = np.empty(len(words), dtype=hash_dtype(bits))
+    for i in range(words.shape[1]):
+        result[f"w{i}"] = words[:, i]
+    return result
+
+
+def to_ints(hashes: np.ndarray) -> list:
+    """
+    :param hashes: array returned by hash_array
+    :return: the hashes as Python ints
+    """
+    if hashes.dtype.names is None:
+        return hashes.tolist()
+    result = [0] * len(hashes)
+    for name in hashes.dtype.names:
+        result = [(r << 64) | w for r, w in zip(result, hashes[name].tolist())]
+    return result
+
+
+def from_ints(values, bits: int) -> np.ndarray:
+    """
+    :param values: iterable of non-negative Python ints
+    :param bits: length of the hashes, higher bits are dropped
+    :return: fixed width array as returned by hash_array
+    """
+    words = hash_words(bits)
+    mask = (1 << (64 * words)) - 1
+    raw = b"".join((v & mask).to_bytes(8 * words, "big") for v in values)
+    return from_words(np.frombuffer(raw, dtype=">u8").reshape(-1, words).astype(np.uint64), bits)
+
+
+def _splitmix64(x: np.ndarray) -> np.ndarray:
+    x = x.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _keys(values: np.ndarray, encoding: str):
+    """
+    Yield the byte string hashed for every value without allocating it.
+
+    zeros: bytes(x), x zero bytes, which is what prepare_hash_function has always hashed
+    int64: the 8 byte little-endian representation of x
+    """
+    if encoding == "int64":
+        view = memoryview(values.astype("<i8").tobytes())
+        return (view[i:i + 8] for i in range(0, len(view), 8))
+    if encoding == "zeros":
+        view = memoryview(bytes(int(values.max(initial=0))))
+        return (view[:x] for x in values.tolist())
+    raise ValueError(f"unknown encoding {encoding}")
+
+
+def hash_array(values, bits=128, function="murmur", encoding="zeros") -> np.ndarray:
+    """
+    Hash a whole array of non-negative integers in one call.
+
+    Digests are read as bytes into a fixed width array, no hex strings or big ints are built. With the default
+    encoding the values are the same as prepare_hash_function(bits, function) gives element by element.
+
+    :param values: NumPy integer array, sequence of ints or a buffer of int64 values
+    :param bits: length of the hash
+    :param function: one of HASH_FUNCTIONS
+    :param encoding: zeros or int64, the byte string hashed for every value
+    :return: array of dtype hash_dtype(bits)
+    """
+    if isinstance(values, (bytes, bytearray, memoryview)):
+        values = np.frombuffer(values, dtype=np.int64)
+    values = np.asarray(values, dtype=np.int64).ravel()
+    words = hash_words(bits)
+
+    if function in ARITHMETIC:
+        result = np.zeros((len(values), words), dtype=np.uint64)
+        if function == "mod":
+            half = bits // 2
+            result[:, -1] = values.astype(np.uint64)
+            if half < 64:
+                result[:, -1] %= np.uint64(1 << half)
+        else:
+            if bits > 64:
+                raise ValueError("splitmix64 gives 64 bit hashes")
+            result[:, -1] = _splitmix64(values)
+        return from_words(result, bits)
+
+    digest = DIGESTS[function]
+    width = 8 * words
+    raw = b"".join(digest(key)[-width:].rjust(width, b"\0") for key in _keys(values, encoding))
+    return from_words(np.frombuffer(raw, dtype=">u8").reshape(-1, words).astype(np.uint64), bits)
+
+
+def prepare_hash_function(bits=128, function="murmur"):
+    """
+    :param bits: length of the hash
+    :param function: one of HASH_FUNCTIONS
+    :return: function hashing a single int, its batch attribute hashes a whole array with hash_array
+    """
+    mask = 2 ** bits - 1
+    if function == "mod":
+        def hash_function(x: int):
+            return x % 2 ** (bits // 2) & mask
+    elif function == "splitmix64":
+        def hash_function(x: int):
+            return int(_splitmix64(np.array([x]))[0]) & mask
+    else:
+        digest = DIGESTS[function]
+
+        def hash_function(x: int):
+            return int.from_bytes(digest(bytes(x)), "big") & mask
+
+    def batch(values, encoding="zeros"):
+        return hash_array(values, bits, function, encoding)
+
+    hash_function.batch = batch
+    hash_function.bits = bits
+    hash_function.function = function
+    return hash_function
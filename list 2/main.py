@@ -2,6 +2,8 @@ import hashlib
 import random
 import matplotlib.pyplot as plt
 
+import mincount
+
 
 def hash_value(value):
     # Use a hash function to generate a 32-bit hash value for a given input value and seed
@@ -10,29 +12,9 @@ def hash_value(value):
     return int(h.hexdigest(), 16)
 
 
-def min_count(k, h, M):
-    # Initialize the counters
-    counters = [2 ** 256 - 1] * k
-
-    # Process each element in the multiset
-    for value in M:
-        # Hash the value k times with different seeds
-        # for i in range(k):
-        #     hash_val = h(value, i)
-        #     # Update the corresponding counter if the hash value has a small number of trailing zeroes
-        #     counters[i] = min(counters[i], math.log(hash_val & -hash_val, 2))
-        hash_val = h(value)
-        if hash_val not in counters and hash_val < counters[k - 1]:
-            counters[k - 1] = hash_val
-            counters.sort()
-
-    # Compute the estimate of the distinct count using the harmonic mean of the counters
-    if counters[k-1] == 1.0:
-        estimate = k - counters.count(1.0)
-    else:
-        estimate = (k - 1) / counters[k - 1]
-
-    return estimate
+def min_count(k, h, M, bits=256):
+    # The integer-domain MinCount of mincount.py, the 256 bit hashes are kept as four uint64 words
+    return mincount.min_count(k, h, M, bits)
 
 
 def task1():
@@ -53,27 +35,33 @@ def task1():
     print("m does not influences estimated value")
 
 
-def task2():
+def task2_data() -> dict:
     ks = [2, 3, 10, 100, 400]
     M = prepare_multi_sets()
-
+    data = {"ks": ks, "n": [len(set(Ms)) for Ms in M]}
     for k in ks:
-        estimates = []
-        n_values = []
-        for Ms in M:
-            # Generate a random multiset of size n with values in the range [0, n*10)
-            # Compute the estimated distinct count using MinCount with the current k
-            estimate = min_count(k, hash_value, Ms)
-            # Store the ratio of the estimate to the actual count
-            estimates.append(estimate / len(set(Ms)))
-            n_values.append(len(set(Ms)))
-        plt.plot(n_values, estimates, label=f'k={k}')
-
-    plt.xlabel('n')
-    plt.ylabel('n_hat/n')
-    plt.legend()
+        # Compute the estimated distinct count of every multiset using MinCount with the current k
+        # Store the ratio of the estimate to the actual count
+        data[f"ratio_{k}"] = [min_count(k, hash_value, Ms) / len(set(Ms)) for Ms in M]
+    return data
+
+
+def plot_task2(data) -> list:
+    fig, ax = plt.subplots()
+    for k in data["ks"]:
+        ax.plot(data["n"], data[f"ratio_{k}"], label=f'k={k}')
+
+    ax.set_xlabel('n')
+    ax.set_ylabel('n_hat/n')
+    ax.legend()
+    return [fig]
+
+
+def task2():
+    plot_task2(task2_data())
     # plt.show()
 
+
 def task3():
     ks = [300]
     M = prepare_multi_sets()
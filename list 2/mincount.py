@@ -1,13 +1,12 @@
-import hashlib
 import random
 
-import mmh3
 import numpy as np
-from farmhash import FarmHash128
-from cityhash import CityHash128
-import xxhash
 from matplotlib import pyplot as plt
 
+from hashing import from_ints, prepare_hash_function, to_ints
+from prefix import multi_k_prefix_estimates, prefix_estimates
+from sketch import min_count_estimate
+
 
 def min_count(k, h, multiset, bits=128):
     """
@@ -22,188 +21,322 @@ def min_count(k, h, multiset, bits=128):
     This technique involves maintaining multiple independent counts for each bucket and taking the minimum of these
     counts as the estimate of the frequency.
 
+    The hashes stay fixed width unsigned words (hashing.hash_dtype) from hashing to selection, only the final
+    estimate is a float.
+
     :param k: the size of the array storing hashes of selected elements
     :param h: hash function with uniform distribution
     :param multiset: multiset to analyze
     :param bits: length of hash function
     :return: estimated value of number of elements in multiset
     """
-    # Initialization
-    upper_bound = 2 ** bits - 1
-    hash_table = [1.0] * k
-    # Analyze multiset
-    for x in multiset:
-        hash_value = h(x) / upper_bound
-        if hash_value < hash_table[k - 1] and hash_value not in hash_table:
-            hash_table[k - 1] = hash_value
-            hash_table.sort()
-
-    return k - hash_table.count(1.0) if hash_table[k - 1] == 1.0 else (k - 1) / hash_table[k - 1]
-
+    if hasattr(h, "batch"):
+        hashes = h.batch(np.asarray(multiset, dtype=np.int64))
+    else:
+        hashes = from_ints(map(h, multiset), bits)
+    return min_count_array(k, hashes, bits)
+
+
+def _unique(hashes):
+    # np.unique compares structured rows as raw bytes and is slow, words sorted with lexsort are not
+    if hashes.dtype.names is None:
+        return np.unique(hashes)
+    hashes = hashes[np.lexsort([hashes[name] for name in reversed(hashes.dtype.names)])]
+    new = np.ones(len(hashes), dtype=bool)
+    new[1:] = False
+    for name in hashes.dtype.names:
+        new[1:] |= hashes[name][1:] != hashes[name][:-1]
+    return hashes[new]
+
+
+def k_smallest(k, hashes, bits=128):
+    """
+    The k smallest distinct hashes below 2 ** bits - 1 without a Python loop over the elements.
 
-def prepare_hash_function(bits=128, function="murmur"):
-    hfs = {
-        "sha3_256": lambda x: int(hashlib.sha3_256(bytes(x)).hexdigest(), 16),
-        "murmur": lambda x: mmh3.hash128(bytes(x), signed=False),
-        "xxhash": lambda x: int(xxhash.xxh128(bytes(x)).hexdigest(), 16),
-        "sha1": lambda x: int(hashlib.sha1(bytes(x)).hexdigest(), 16),
-        "md5": lambda x: int(hashlib.md5(bytes(x)).hexdigest(), 16),
-        "farmhash": lambda x: FarmHash128(bytes(x)),
-        "cityhash": lambda x: CityHash128(bytes(x)),
-        "mod": lambda x: x % 2 ** (bits // 2),
-    }
+    Only the candidates up to the k-th smallest (most significant word of the) hash are sorted. Should duplicates
+    leave fewer than k distinct candidates, they are kept and the next cut is taken among the larger keys only, at a
+    rank scaled by the duplication seen so far, so every hash is deduplicated once however often it repeats.
 
-    def hash_function(x: int):
-        return hfs[function](x) & (2 ** bits - 1)
+    :param k: number of hashes to keep
+    :param hashes: array of dtype hashing.hash_dtype(bits)
+    :param bits: length of hash function
+    :return: sorted array of at most k distinct hashes
+    """
+    structured = hashes.dtype.names is not None
+    key = hashes[hashes.dtype.names[0]] if structured else hashes
+    top = bits - 64 * (len(hashes.dtype.names) - 1) if structured else bits
+    # the largest possible hash is normalized to 1.0 and never counted
+    top_max = np.uint64(2 ** top - 1)
+    full = key == top_max
+    if structured:
+        for name in hashes.dtype.names[1:]:
+            full &= hashes[name] == np.uint64(2 ** 64 - 1)
+    if full.any():
+        hashes, key = hashes[~full], key[~full]
+
+    # distinct hashes of disjoint, increasing key ranges, so their concatenation is sorted
+    kept = []
+    found = 0
+    m = k
+    while True:
+        if len(key) <= m:
+            kept.append(_unique(hashes))
+            break
+        cut = np.partition(key, m - 1)[m - 1]
+        below = key <= cut
+        kept.append(_unique(hashes[below]))
+        found += len(kept[-1])
+        if found >= k:
+            break
+        hashes, key = hashes[~below], key[~below]
+        # at least double the rank, more when the hashes repeat more often
+        m = max(2 * m, m * k // found)
+    return np.concatenate(kept)[:k]
+
+
+def min_count_array(k, hashes, bits=128):
+    """
+    The estimator of min_count over already hashed values.
 
-    return hash_function
+    :param k: the size of the array storing hashes of selected elements
+    :param hashes: array of dtype hashing.hash_dtype(bits), or an iterable of such chunks
+    :param bits: length of hash function
+    :return: estimated value of number of elements in multiset
+    """
+    chunks = [hashes] if isinstance(hashes, np.ndarray) else hashes
+    kept = None
+    for chunk in chunks:
+        kept = k_smallest(k, chunk if kept is None else np.concatenate([kept, chunk]), bits)
+    if kept is None or len(kept) == 0:
+        return 0
+    return min_count_estimate(k, len(kept), to_ints(kept[-1:])[0], bits)
 
 
 def prepare_mutlisets(multiply=1, shuffle=False):
     def prepare_multiset(n: int):
-        temp_set = []
         lower_bound = int(n / 2 * (n - 1))
         upper_bound = int((n + 1) / 2 * n)
-        for i in range(lower_bound, upper_bound):
-            temp_set.append(i + 1)
-        return random.sample(temp_set * multiply, len(temp_set * multiply)) if shuffle else temp_set * multiply
+        temp_set = list(range(lower_bound + 1, upper_bound + 1)) * multiply
+        if shuffle:
+            random.shuffle(temp_set)
+        return temp_set
 
     return prepare_multiset
 
 
-def task5_a(m=5, n=1000):
+def task5_a_data(m=5, n=1000, incremental=False) -> dict:
+    # incremental: one pass over a stream of n elements repeated m times, estimates recorded after every element
     h = prepare_hash_function()
+    data = {"m": m, "n": n}
     for current_m in range(1, m + 1):
         n_hat = []
         multiset = prepare_mutlisets(m)
+        if incremental:
+            stream = np.repeat(np.arange(1, n + 1), m)
+            prefix = prefix_estimates(10, h, stream, [trial * m for trial in range(1, n + 1)])
         for trial in range(1, n + 1):
-            n_hat.append(min_count(10, h, multiset(trial)))
+            n_hat.append(prefix[trial - 1] if incremental else min_count(10, h, multiset(trial)))
             if trial % 100 == 0:
                 print(f"m = {current_m} done in {100 * trial / n}%")
+        data[f"n_hat_{current_m}"] = np.array(n_hat)
+    return data
+
+
+def plot_task5_a(data) -> dict:
+    figures = dict()
+    n = data["n"]
+    for current_m in range(1, data["m"] + 1):
         fig, ax = plt.subplots()
-        ax.plot(n_hat, label='n̂')
+        ax.plot(data[f"n_hat_{current_m}"], label='n̂')
         ax.plot([1, n], [1, n], label='n = n̂')
         ax.set_xlabel('n')
         ax.set_ylabel('n̂')
         ax.legend()
-        plt.title(f"m = {current_m}, k = 10")
-        plt.show()
-        fig.savefig(f"output/task 5a m = {current_m}.png")
+        ax.set_title(f"m = {current_m}, k = 10")
+        figures[f"task 5a m = {current_m}"] = fig
+    return figures
+
+
+def task5_a(m=5, n=1000, incremental=False):
+    show(plot_task5_a(task5_a_data(m, n, incremental)))
 
 
-def task5_b(n=1000):
+def task5_b_data(n=1000, incremental=False) -> dict:
     ks = [2, 3, 10, 100, 400]
     h = prepare_hash_function()
+    # incremental: a single pass over 1..n gives the estimates of every prefix for all k at once
+    prefix = multi_k_prefix_estimates(ks, h, range(1, n + 1)) if incremental else None
+    data = {"ks": np.array(ks), "n": n}
     for current_k in ks:
         n_hat = []
         multiset = prepare_mutlisets()
         for trial in range(1, n + 1):
-            n_hat.append(min_count(current_k, h, multiset(trial)) / trial)
+            estimate = prefix[current_k][trial - 1] if incremental else min_count(current_k, h, multiset(trial))
+            n_hat.append(estimate / trial)
             if trial % 100 == 0:
                 print(f"k = {current_k} done in {100 * trial / n}%")
+        data[f"ratio_{current_k}"] = np.array(n_hat)
+    return data
+
+
+def plot_task5_b(data) -> dict:
+    figures = dict()
+    n = data["n"]
+    for current_k in data["ks"]:
+        n_hat = data[f"ratio_{current_k}"]
         fig, ax = plt.subplots()
-        ax.scatter([i for i, _ in enumerate(n_hat)], n_hat, label='n̂/n', marker=".")
+        ax.scatter(np.arange(len(n_hat)), n_hat, label='n̂/n', marker=".")
         ax.plot([1, n], [1, 1], label='n = 1.0', color='orange')
 
         ax.set_xlabel('n')
         ax.set_ylabel('n̂/n')
         ax.legend()
-        plt.title(f"k = {current_k}")
-        plt.show()
-        fig.savefig(f"output/task 5b k = {current_k}.png")
+        ax.set_title(f"k = {current_k}")
+        figures[f"task 5b k = {current_k}"] = fig
+    return figures
+
 
+def task5_b(n=1000, incremental=False):
+    show(plot_task5_b(task5_b_data(n, incremental)))
 
-def task5_c(n=1000):
+
+def task5_c_data(n=1000, incremental=False) -> dict:
     ks = [207]
     h = prepare_hash_function()
+    prefix = multi_k_prefix_estimates(ks, h, range(1, n + 1)) if incremental else None
+    data = {"ks": np.array(ks), "n": n}
     for current_k in ks:
         n_hat = []
-        data = []
+        ratios = []
         multiset = prepare_mutlisets()
         for trial in range(1, n + 1):
-            res = min_count(current_k, h, multiset(trial)) / trial
-            data.append(res)
+            estimate = prefix[current_k][trial - 1] if incremental else min_count(current_k, h, multiset(trial))
+            res = estimate / trial
+            ratios.append(res)
             n_hat.append(abs(res - 1) < 0.1)
             if trial % 100 == 0:
                 print(f"k = {current_k} done in {100 * trial / n}%")
         print(f"k = {current_k} |n̂/n - 1| < 10% is {n_hat.count(1) / len(n_hat)} ({n_hat.count(1)}/{len(n_hat)})")
+        data[f"ratio_{current_k}"] = np.array(ratios)
+    return data
+
 
+def plot_task5_c(data) -> dict:
+    figures = dict()
+    n = data["n"]
+    for current_k in data["ks"]:
+        ratios = data[f"ratio_{current_k}"]
         fig, ax = plt.subplots()
-        ax.scatter([i for i, _ in enumerate(data)], data, label='n̂/n', marker=".")
+        ax.scatter(np.arange(len(ratios)), ratios, label='n̂/n', marker=".")
         ax.plot([1, n], [0.9, 0.9], label='n = 0.9', color='orange')
         ax.plot([1, n], [1.1, 1.1], label='n = 1.1', color='orange')
         ax.set_xlabel('n')
         ax.set_ylabel('n̂/n')
         ax.legend()
-        plt.title(f"k = {current_k}")
-        plt.show()
-        fig.savefig(f"output/task 5c k = {current_k}.png")
+        ax.set_title(f"k = {current_k}")
+        figures[f"task 5c k = {current_k}"] = fig
+    return figures
 
 
-def task6(n=1000):
-    hash_functions = ['sha3_256', 'murmur', 'xxhash', 'sha1', 'md5', 'farmhash', 'cityhash', 'mod']
-    hash_lengths = [8, 16, 32, 64, 96, 128]
+def task5_c(n=1000, incremental=False):
+    show(plot_task5_c(task5_c_data(n, incremental)))
 
-    for h_length in hash_lengths:
-        data = {key: [] for key in hash_functions}
-        for h_fn in hash_functions:
+
+HASH_FUNCTIONS_TASK6 = ['sha3_256', 'murmur', 'xxhash', 'sha1', 'md5', 'farmhash', 'cityhash', 'mod']
+HASH_LENGTHS_TASK6 = [8, 16, 32, 64, 96, 128]
+
+
+def task6_data(n=1000, incremental=False) -> dict:
+    data = {"n": n, "hash_lengths": np.array(HASH_LENGTHS_TASK6), "hash_functions": np.array(HASH_FUNCTIONS_TASK6)}
+    for h_length in HASH_LENGTHS_TASK6:
+        for h_fn in HASH_FUNCTIONS_TASK6:
             h = prepare_hash_function(h_length, h_fn)
             multiset = prepare_mutlisets()
+            prefix = prefix_estimates(16, h, range(1, n + 1), bits=h_length) if incremental else None
+            ratios = []
             for trial in range(1, n + 1):
-                data[h_fn].append(min_count(16, h, multiset(trial), h_length) / trial)
+                estimate = prefix[trial - 1] if incremental else min_count(16, h, multiset(trial), h_length)
+                ratios.append(estimate / trial)
                 if trial % 100 == 0:
                     print(f"{h_fn} done in {100 * trial / n}%")
-        plot_for_task6(data, h_length, n)
-        data.pop('mod')
-        plot_for_task6(data, h_length, n, False)
+            data[f"ratio_{h_fn}_{h_length}"] = np.array(ratios)
+    return data
+
+
+def plot_task6(data) -> dict:
+    figures = dict()
+    for h_length in data["hash_lengths"]:
+        ratios = {h_fn: data[f"ratio_{h_fn}_{h_length}"] for h_fn in data["hash_functions"]}
+        figures[f"task 6 h_length = {h_length} with mod"] = plot_for_task6(ratios, h_length, data["n"])
+        ratios.pop('mod')
+        figures[f"task 6 h_length = {h_length}"] = plot_for_task6(ratios, h_length, data["n"])
+    return figures
+
 
+def task6(n=1000, incremental=False):
+    show(plot_task6(task6_data(n, incremental)))
 
-def plot_for_task6(data, h_length, n, with_mod=True):
+
+def plot_for_task6(data, h_length, n):
     fig, ax = plt.subplots()
     for alg, alg_data in data.items():
         label = f"{alg} {np.std(alg_data):.2f}"
-        ax.scatter([i for i, _ in enumerate(alg_data)], alg_data, label=label, marker=".")
+        ax.scatter(np.arange(len(alg_data)), alg_data, label=label, marker=".")
     ax.plot([1, n], [1, 1], color='orange')
     ax.set_xlabel('n')
     ax.set_ylabel('n̂/n')
     ax.legend()
-    plt.title(f"h_length = {h_length}")
-    plt.show()
-    fig.savefig(f"output/task 6 h_length = {h_length}{' with mod' if with_mod else ''}.png")
+    ax.set_title(f"h_length = {h_length}")
+    return fig
 
 
-def task7(n = 1000):
+def task7_data(n=1000, incremental=False) -> dict:
     # a     d
     # 0.005 0.091
     # 0.05  0.0578
     # 0.01  0.08
-    alphas = [0.05]
+    alpha = 0.05
     delta = 0.091
     k = 400
     h = prepare_hash_function()
-    n_hat = {0.05: [], 0.01: [], 0.005: []}
-    data = {0.05: [], 0.01: [], 0.005: []}
-    for current_alpha in alphas:
-        multiset = prepare_mutlisets()
-        for ms_size in range(1, n + 1):
-            for _ in range(1):
-                res = min_count(k, h, multiset(ms_size)) / ms_size
-                data[current_alpha].append(res)
-                n_hat[current_alpha].append(abs(res - 1) < delta)
-        print(f"α = {[current_alpha]}, |n̂/n - 1| > 1 + δ is {n_hat[current_alpha].count(1) / len(n_hat[current_alpha])} ({n_hat[current_alpha].count(1)}/{len(n_hat[current_alpha])})")
-        print(f"var = {np.var(n_hat[current_alpha])}")
+    multiset = prepare_mutlisets()
+    prefix = prefix_estimates(k, h, range(1, n + 1)) if incremental else None
+    ratios = []
+    n_hat = []
+    for ms_size in range(1, n + 1):
+        estimate = prefix[ms_size - 1] if incremental else min_count(k, h, multiset(ms_size))
+        res = estimate / ms_size
+        ratios.append(res)
+        n_hat.append(abs(res - 1) < delta)
+    print(f"α = {[alpha]}, |n̂/n - 1| > 1 + δ is {n_hat.count(1) / len(n_hat)} ({n_hat.count(1)}/{len(n_hat)})")
+    print(f"var = {np.var(n_hat)}")
+    return {"n": n, "alpha": alpha, "delta": delta, "ratio": np.array(ratios)}
+
+
+def plot_task7(data) -> dict:
+    n, delta = data["n"], data["delta"]
+    fig, ax = plt.subplots()
+    ax.scatter(np.arange(len(data["ratio"])), data["ratio"], label='n̂/n', marker=".")
+    ax.plot([1, n], [1 - delta, 1 - delta], label=f'n = {1 - delta}', color='orange')
+    ax.plot([1, n], [1 + delta, 1 + delta], label=f'n = {1 + delta}', color='orange')
+    ax.set_xlabel('n')
+    ax.set_ylabel('n̂/n')
+    ax.set_title(f"α = {[data['alpha']]}, δ = {delta}")
+    ax.legend()
+    return {"task 7": fig}
 
-        fig, ax = plt.subplots()
-        ax.scatter([i for i, _ in enumerate(data[current_alpha])], data[current_alpha], label='n̂/n', marker=".")
-        ax.plot([1, n], [1-delta, 1-delta], label=f'n = {1-delta}', color='orange')
-        ax.plot([1, n], [1+delta, 1+delta], label=f'n = {1+delta}', color='orange')
-        ax.set_xlabel('n')
-        ax.set_ylabel('n̂/n')
-        plt.title(f"α = {[current_alpha]}, δ = {delta}")
 
-        ax.legend()
+def task7(n=1000, incremental=False):
+    plot_task7(task7_data(n, incremental))
+    plt.show()
+
+
+def show(figures: dict):
+    # save first, a figure is blank once its window has been closed
+    for name, fig in figures.items():
+        fig.savefig(f"output/{name}.png")
+    plt.show()
 
-        plt.show()
 
 if __name__ == "__main__":
     # task5_a()
@@ -0,0 +1,136 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from hashing import hash_array, hash_dtype, to_ints
+from mincount import k_smallest
+from sketch import min_count_estimate
+from stream import CHUNK_SIZE, iter_chunks
+
+
+def _sketch_values(values, k, bits, function, encoding):
+    return k_smallest(k, hash_array(values, bits, function, encoding), bits)
+
+
+def _sketch_shared(name, length, start, stop, k, bits, function, encoding):
+    # attach to the block written by the parent, the ids are never pickled
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        values = np.ndarray((length,), dtype=np.int64, buffer=block.buf)[start:stop]
+        kept = _sketch_values(values, k, bits, function, encoding)
+        del values
+    finally:
+        block.close()
+    return kept
+
+
+def _sketch_file(path, dtype, start, stop, k, bits, function, encoding):
+    values = np.memmap(path, dtype=dtype, mode="r")[start:stop]
+    return _sketch_values(values, k, bits, function, encoding)
+
+
+def _to_shared(values: np.ndarray) -> shared_memory.SharedMemory:
+    block = shared_memory.SharedMemory(create=True, size=max(1, values.nbytes))
+    np.ndarray(values.shape, dtype=np.int64, buffer=block.buf)[:] = values
+    return block
+
+
+def _release(block):
+    block.close()
+    block.unlink()
+
+
+def _merge(kept, chunk_kept, k, bits):
+    return chunk_kept if kept is None else k_smallest(k, np.concatenate([kept, chunk_kept]), bits)
+
+
+def parallel_k_smallest(k, data, bits=128, function="murmur", encoding="int64", workers=None, chunk_size=CHUNK_SIZE,
+                        dtype="<i8"):
+    """
+    The k smallest distinct hashes of data, with every chunk hashed and reduced to its own k smallest in a process
+    pool. The k smallest of the union are among the per-chunk ones, so merging them gives exactly the sequential
+    result, independent of the chunking and the number of workers.
+
+    Arrays are copied once into shared memory and files are memory-mapped by every worker, so the workers read the
+    ids in place. Chunks of other iterables each go through their own shared memory block, at most two per worker
+    at a time.
+
+    :param k: number of hashes to keep
+    :param data: integer array, path of a binary file of ids or an iterable of ids
+    :param bits: length of hash function
+    :param function: hash family from hashing.HASH_FUNCTIONS
+    :param encoding: int64, the 8 byte representation of every id as in stream_min_count, or zeros, x zero bytes for
+        id x as in min_count, which only suits small ids
+    :param workers: number of processes, defaults to the number of cores; 1 runs in this process
+    :param chunk_size: number of ids per chunk
+    :param dtype: dtype of the ids in a binary file
+    :return: sorted array of dtype hashing.hash_dtype(bits)
+    """
+    workers = workers or os.cpu_count()
+    options = (k, bits, function, encoding)
+    kept = None
+
+    if workers == 1:
+        if isinstance(data, (str, os.PathLike)):
+            data = np.memmap(data, dtype=dtype, mode="r")
+        if isinstance(data, np.ndarray):
+            chunks = (data[s:s + chunk_size] for s in range(0, len(data), chunk_size))
+        else:
+            chunks = iter_chunks(data, chunk_size)
+        for chunk in chunks:
+            kept = _merge(kept, _sketch_values(chunk, *options), k, bits)
+        return np.zeros(0, dtype=hash_dtype(bits)) if kept is None else kept
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        if isinstance(data, (str, os.PathLike)):
+            length = len(np.memmap(data, dtype=dtype, mode="r"))
+            futures = [executor.submit(_sketch_file, os.fspath(data), dtype, s, min(s + chunk_size, length), *options)
+                       for s in range(0, length, chunk_size)]
+            for future in futures:
+                kept = _merge(kept, future.result(), k, bits)
+        elif isinstance(data, np.ndarray):
+            values = np.ascontiguousarray(data, dtype=np.int64).ravel()
+            block = _to_shared(values)
+            try:
+                futures = [executor.submit(_sketch_shared, block.name, len(values), s,
+                                           min(s + chunk_size, len(values)), *options)
+                           for s in range(0, len(values), chunk_size)]
+                for future in futures:
+                    kept = _merge(kept, future.result(), k, bits)
+            finally:
+                _release(block)
+        else:
+            pending = dict()
+            try:
+                for chunk in iter_chunks(data, chunk_size):
+                    block = _to_shared(chunk)
+                    pending[executor.submit(_sketch_shared, block.name, len(chunk), 0, len(chunk), *options)] = block
+                    if len(pending) >= 2 * workers:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            kept = _merge(kept, future.result(), k, bits)
+                            _release(pending.pop(future))
+                for future in list(pending):
+                    kept = _merge(kept, future.result(), k, bits)
+                    _release(pending.pop(future))
+            finally:
+                for block in pending.values():
+                    _release(block)
+    return np.zeros(0, dtype=hash_dtype(bits)) if kept is None else kept
+
+
+def parallel_min_count(k, data, bits=128, function="murmur", encoding="int64", workers=None, chunk_size=CHUNK_SIZE,
+                       dtype="<i8"):
+    """
+    MinCount over data split between processes, equal to stream_min_count over the same ids. With encoding="zeros"
+    it equals min_count(k, prepare_hash_function(bits, function), data, bits) on the small task multisets. Arguments
+    as parallel_k_smallest.
+
+    :return: estimated number of distinct ids
+    """
+    kept = parallel_k_smallest(k, data, bits, function, encoding, workers, chunk_size, dtype)
+    if len(kept) == 0:
+        return 0
+    return min_count_estimate(k, len(kept), to_ints(kept[-1:])[0], bits)
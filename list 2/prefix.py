@@ -0,0 +1,69 @@
+import bisect
+import itertools
+
+import numpy as np
+
+from hashing import to_ints
+from sketch import MinCountSketch, min_count_estimate
+
+
+def iter_hashes(h, stream, chunk_size=1 << 16):
+    # hash the stream chunk by chunk when h supports batches
+    if not hasattr(h, "batch"):
+        yield from map(h, stream)
+        return
+    iterator = iter(stream)
+    while True:
+        chunk = np.fromiter(itertools.islice(iterator, chunk_size), dtype=np.int64)
+        if len(chunk) == 0:
+            return
+        yield from to_ints(h.batch(chunk))
+
+
+def prefix_estimates(k, h, stream, checkpoints=None, bits=128) -> list:
+    """
+    Feed a growing stream into one sketch and record the estimate at every checkpoint.
+
+    :param k: the size of the array storing hashes of selected elements
+    :param h: hash function with uniform distribution
+    :param stream: iterable of elements
+    :param checkpoints: numbers of elements after which the estimate is recorded, every element by default
+    :param bits: length of hash function
+    :return: estimates of the number of distinct elements in every prefix, equal to min_count on that prefix
+    """
+    checkpoints = None if checkpoints is None else set(checkpoints)
+    sketch = MinCountSketch(k, h, bits)
+    estimates = []
+    for position, value in enumerate(iter_hashes(h, stream), 1):
+        sketch.add_hash(value)
+        if checkpoints is None or position in checkpoints:
+            estimates.append(sketch.estimate())
+    return estimates
+
+
+def multi_k_prefix_estimates(ks, h, stream, checkpoints=None, bits=128) -> dict:
+    """
+    prefix_estimates for several k in a single pass.
+
+    Only the max(ks) smallest distinct hashes are kept in a sorted list, its first k entries are exactly the hashes
+    a sketch of size k would keep, so every estimate equals min_count(k, h, prefix, bits).
+
+    :return: dictionary k -> list of estimates
+    """
+    checkpoints = None if checkpoints is None else set(checkpoints)
+    k_max = max(ks)
+    upper_bound = 2 ** bits - 1
+    kept = []
+    members = set()
+    estimates = {k: [] for k in ks}
+    for position, value in enumerate(iter_hashes(h, stream), 1):
+        if value < upper_bound and value not in members and (len(kept) < k_max or value < kept[-1]):
+            bisect.insort(kept, value)
+            members.add(value)
+            if len(kept) > k_max:
+                members.discard(kept.pop())
+        if checkpoints is None or position in checkpoints:
+            for k in ks:
+                count = min(len(kept), k)
+                estimates[k].append(min_count_estimate(k, count, kept[count - 1] if count else 0, bits))
+    return estimates
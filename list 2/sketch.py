@@ -0,0 +1,160 @@
+import heapq
+import struct
+
+import numpy as np
+
+from hashing import from_ints, from_words, hash_words, prepare_hash_function, to_ints
+
+# magic, format version, k, bits, number of hashes, length of the hash family name
+HEADER = struct.Struct("<4sBIHIB")
+MAGIC = b"MCNT"
+VERSION = 1
+
+
+def min_count_estimate(k: int, count: int, largest: int, bits: int):
+    """
+    The MinCount estimate (k - 1) / (largest / (2 ** bits - 1)) computed on exact ints, the only conversion to float
+    is the correctly rounded final division.
+
+    :param k: the size of the array storing hashes of selected elements
+    :param count: number of distinct hashes kept, at most k
+    :param largest: the largest kept hash
+    :param bits: length of hash function
+    :return: estimated number of distinct elements
+    """
+    if count < k:
+        return count
+    return (k - 1) * (2 ** bits - 1) / largest
+
+
+class MinCountSketch:
+    """
+    Persistent MinCount state: the k smallest distinct hash values seen so far.
+
+    The values are kept in a bounded max-heap with a set next to it for deduplication, so adding an element costs
+    O(log k) instead of the O(k log k) of sorting the whole table. The estimate is the one of min_count.
+    """
+
+    def __init__(self, k: int, h=None, bits=128, function="murmur"):
+        """
+        :param k: number of smallest hashes kept
+        :param h: hash function with uniform distribution, prepare_hash_function(bits, function) by default
+        :param bits: length of hash function
+        :param function: hash family used when h is not given, None for a sketch that only merges and estimates
+        """
+        self.k = k
+        self.bits = bits
+        if h is None and function is not None:
+            h = prepare_hash_function(bits, function)
+        self.h = h
+        self.function = getattr(h, "function", "")
+        self.upper_bound = 2 ** bits - 1
+        # negated hash values, -self._heap[0] is the largest kept hash
+        self._heap = []
+        self._members = set()
+
+    def add_hash(self, value: int):
+        # a hash equal to the upper bound is 1.0 after normalization and is never kept
+        if value >= self.upper_bound or value in self._members:
+            return
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, -value)
+            self._members.add(value)
+        elif value < -self._heap[0]:
+            self._members.discard(-heapq.heapreplace(self._heap, -value))
+            self._members.add(value)
+
+    def add(self, x):
+        self.add_hash(self.h(x))
+        return self
+
+    def add_many(self, multiset):
+        # hash the whole multiset in one call when h supports it
+        hashes = to_ints(self.h.batch(multiset)) if hasattr(self.h, "batch") else map(self.h, multiset)
+        for value in hashes:
+            self.add_hash(value)
+        return self
+
+    def merge(self, other):
+        """
+        Add the hashes kept by other, the result is the sketch of the union of both multisets.
+        """
+        if (self.k, self.bits) != (other.k, other.bits):
+            raise ValueError("only sketches with the same k and hash length can be merged")
+        if self.function and other.function and self.function != other.function:
+            raise ValueError("only sketches built with the same hash family can be merged")
+        for value in other.values():
+            self.add_hash(value)
+        return self
+
+    def values(self) -> list:
+        return sorted(-v for v in self._heap)
+
+    def estimate(self):
+        return min_count_estimate(self.k, len(self._heap), -self._heap[0] if self._heap else 0, self.bits)
+
+    def to_bytes(self) -> bytes:
+        """
+        Compact binary form: a header with k, the hash length and the hash family followed by the kept hashes as
+        fixed width big-endian words.
+        """
+        name = self.function.encode("ascii")
+        header = HEADER.pack(MAGIC, VERSION, self.k, self.bits, len(self), len(name)) + name
+        values = from_ints(self.values(), self.bits)
+        words = values.view(np.uint64).reshape(-1, hash_words(self.bits))
+        return header + words.astype(">u8").tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes, h=None):
+        """
+        :param data: output of to_bytes
+        :param h: hash function, by default the stored family; needed to add elements to a sketch of a custom hash
+        :return: the deserialized sketch
+        """
+        magic, version, k, bits, count, length = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a serialized MinCountSketch")
+        offset = HEADER.size
+        function = data[offset:offset + length].decode("ascii") or None
+        offset += length
+        sketch = cls(k, h, bits, function)
+        sketch.function = sketch.function or function or ""
+        words = hash_words(bits)
+        raw = np.frombuffer(data, dtype=">u8", count=count * words, offset=offset).reshape(count, words)
+        for value in to_ints(from_words(raw.astype(np.uint64), bits)):
+            sketch.add_hash(value)
+        return sketch
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __repr__(self):
+        return f"MinCountSketch(k={self.k}, bits={self.bits}, estimate={self.estimate()})"
+
+
+def union(*sketches) -> MinCountSketch:
+    """
+    :return: new sketch of the union of the multisets summarized by sketches
+    """
+    first = sketches[0]
+    result = MinCountSketch(first.k, first.h, first.bits, None)
+    result.function = first.function
+    for sketch in sketches:
+        result.merge(sketch)
+    return result
+
+
+def jaccard(a: MinCountSketch, b: MinCountSketch) -> float:
+    """
+    Estimate |A & B| / |A | B| as the share of the k smallest hashes of the union that both sketches contain.
+    """
+    both = set(a.values()) & set(b.values())
+    smallest = union(a, b).values()
+    return sum(1 for v in smallest if v in both) / len(smallest) if smallest else 0.0
+
+
+def intersection(a: MinCountSketch, b: MinCountSketch) -> float:
+    """
+    :return: estimated number of distinct elements in both multisets
+    """
+    return jaccard(a, b) * union(a, b).estimate()
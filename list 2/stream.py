@@ -0,0 +1,89 @@
+import itertools
+
+import numpy as np
+
+from hashing import hash_array
+from mincount import min_count_array
+
+CHUNK_SIZE = 1 << 20
+
+
+def iter_chunks(iterable, chunk_size=CHUNK_SIZE):
+    """
+    :param iterable: generator or any iterable of non-negative ints
+    :param chunk_size: number of ids per chunk
+    :return: generator of int64 arrays
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = np.fromiter(itertools.islice(iterator, chunk_size), dtype=np.int64)
+        if len(chunk) == 0:
+            return
+        yield chunk
+
+
+def iter_binary_ids(path, dtype="<i8", chunk_size=CHUNK_SIZE):
+    """
+    :param path: file of fixed width binary ids
+    :param dtype: dtype of a single id
+    :param chunk_size: number of ids per chunk
+    :return: generator of views into the memory-mapped file
+    """
+    ids = np.memmap(path, dtype=dtype, mode="r")
+    for start in range(0, len(ids), chunk_size):
+        yield ids[start:start + chunk_size]
+
+
+def iter_text_ids(path, block_size=CHUNK_SIZE * 16):
+    """
+    :param path: text file with one integer id per line
+    :param block_size: number of bytes read at once
+    :return: generator of int64 arrays
+    """
+    rest = b""
+    with open(path, "rb") as file:
+        while True:
+            block = file.read(block_size)
+            if not block:
+                break
+            block = rest + block
+            end = block.rfind(b"\n") + 1
+            block, rest = block[:end], block[end:]
+            if block.strip():
+                yield np.fromstring(block, dtype=np.int64, sep=" ")
+    if rest.strip():
+        yield np.fromstring(rest, dtype=np.int64, sep=" ")
+
+
+def iter_multiset(n: int, multiply=1, chunk_size=CHUNK_SIZE):
+    """
+    The multiset of prepare_mutlisets(multiply)(n) in chunks, without ever building it. MinCount does not depend on
+    the order of the elements, so a shuffled multiset gives the same estimate.
+    """
+    lower_bound = int(n / 2 * (n - 1))
+    upper_bound = int((n + 1) / 2 * n)
+    for _ in range(multiply):
+        for start in range(lower_bound + 1, upper_bound + 1, chunk_size):
+            yield np.arange(start, min(start + chunk_size, upper_bound + 1), dtype=np.int64)
+
+
+def hash_chunks(chunks, bits=128, function="murmur", encoding="int64"):
+    for chunk in chunks:
+        yield hash_array(chunk, bits, function, encoding)
+
+
+def stream_min_count(k, chunks, bits=128, function="murmur", encoding="int64"):
+    """
+    MinCount over a stream of id chunks in O(k + chunk size) memory.
+
+    The default encoding hashes the 8 byte representation of every id. The zeros encoding of min_count hashes x zero
+    bytes for id x and only suits small ids.
+
+    :param k: the size of the array storing hashes of selected elements
+    :param chunks: iterable of integer arrays, e.g. from iter_chunks, iter_binary_ids or iter_text_ids
+    :param bits: length of hash function
+    :param function: hash family from hashing.HASH_FUNCTIONS
+    :param encoding: int64 or zeros
+    :return: estimated number of distinct ids
+    """
+    return min_count_array(k, hash_chunks(chunks, bits, function, encoding), bits)
@@ -1,145 +1,230 @@
-import os
-import re
+from functools import lru_cache
 
 import numpy as np
 import matplotlib.pyplot as plt
 
-import scipy
-import pandas as pd
+from scipy.special import betainc, gammainc, gammaincc, gammaln, xlogy
+
+from store import ResultsStore, round_grid
+from tables import ProbabilityCache
+
+
+def _by_depth(n, q, tail, log_term):
+    """
+    Evaluate tail(n, q) + sum over k < n of exp(log_term(n, q, k)) on the broadcast (n, q) grid, vectorized over q
+    and k for every distinct n.
+    """
+    n, q = np.broadcast_arrays(np.asarray(n, dtype=np.int64), np.asarray(q, dtype=float))
+    result = np.empty(n.shape)
+    for depth in np.unique(n):
+        mask = n == depth
+        qs = q[mask]
+        k = np.arange(depth)[None, :]
+        result[mask] = tail(depth, qs) + np.exp(log_term(depth, qs[:, None], k)).sum(axis=1)
+    return result[()]
 
 
 def P_Nakamoto(n, q):
-    p = 1 - q
-    alpha = n * q / p
-    prob = 1 - sum(
-        (np.power(alpha, k) * np.exp(-alpha) / np.math.factorial(k)) * (1 - np.power(q / p, (n - k))) for k in
-        range(0, n))
-    return prob
+    """
+    Probability that an attacker with hash share q ever catches up from n confirmations, by Nakamoto's formula
+    1 - sum_{k<n} Poisson(k; nq/p) (1 - (q/p)^(n-k)).
+
+    The 1 - sum of the Poisson terms is their upper tail, the regularized incomplete gamma function; the remaining
+    terms are summed in log space, so no cancellation happens even when the probability is tiny.
+
+    :param n: number of confirmations, int or array
+    :param q: hash share of the attacker, float or array broadcast against n
+    :return: probability of the same shape as the broadcast arguments
+    """
+    def log_term(n, q, k):
+        p = 1 - q
+        alpha = n * q / p
+        return xlogy(k, alpha) - alpha - gammaln(k + 1) + xlogy(n - k, q) - (n - k) * np.log(p)
+
+    return _by_depth(n, q, lambda n, q: gammainc(n, n * q / (1 - q)), log_term)
 
 
 def P_Grunspan(n, q):
-    p = 1 - q
-    prob = 1 - sum(
-        (np.power(p, n) * np.power(q, k) - np.power(p, k) * np.power(q, n)) * scipy.special.comb(k + n - 1, k) for k
-        in range(0, n))
-    return prob
+    """
+    Probability that an attacker with hash share q ever catches up from n confirmations, by Grunspan's formula
+    1 - sum_{k<n} (p^n q^k - p^k q^n) C(k + n - 1, k).
 
+    1 - sum of the p^n q^k terms is the negative binomial tail I_q(n, n); the q^n terms are summed in log space.
 
-def point_one():
-    n_values = [1, 3, 6, 12, 24, 48]
-    q_values = np.linspace(0, 0.5, 100)
+    :param n: number of confirmations, int or array
+    :param q: hash share of the attacker, float or array broadcast against n
+    :return: probability of the same shape as the broadcast arguments
+    """
+    def log_term(n, q, k):
+        return gammaln(k + n) - gammaln(k + 1) - gammaln(n) + xlogy(k, 1 - q) + xlogy(n, q)
 
-    fig, axes = plt.subplots(nrows=2, ncols=3, figsize=(12, 8))
+    return _by_depth(n, q, lambda n, q: betainc(n, n, q), log_term)
 
-    for i, ax in enumerate(axes.flat):
-        n = n_values[i]
-        prob_nak_vals = [P_Nakamoto(n, q) for q in q_values]
-        prob_gru_vals = [P_Grunspan(n, q) for q in q_values]
 
-        ax.plot(q_values, prob_nak_vals, label='Nakamoto')
-        ax.plot(q_values, prob_gru_vals, label='Grunspan')
+# probability tables shared by the points, kept on disk between runs
+TABLES = ProbabilityCache({"nakamoto": P_Nakamoto, "grunspan": P_Grunspan}, directory="results/tables")
+
+
+def _nakamoto_closed(n, q):
+    # sum_{k<n} Poisson(k; nq/p) (q/p)^(n-k) = e^(n - nq/p) (q/p)^n P(Poisson(n) < n)
+    p = 1 - q
+    alpha = n * q / p
+    return gammainc(n, alpha) + np.exp(n - alpha + xlogy(n, q) - n * np.log(p)) * gammaincc(n, n)
+
+
+def _grunspan_closed(n, q):
+    # both sums of Grunspan's formula are the negative binomial tail I_q(n, n)
+    return 2 * betainc(n, n, q)
+
+
+# O(1) forms of P_Nakamoto and P_Grunspan in n, used by the depth search
+CLOSED_FORMS = {"nakamoto": _nakamoto_closed, "grunspan": _grunspan_closed}
+
+
+@lru_cache(maxsize=None)
+def _depth(model, q, prob):
+    if q >= 0.5:
+        return float("inf")
+    probability = CLOSED_FORMS[model]
+    if probability(1, q) <= prob:
+        return 1
+    # P(n, q) decreases in n: double until below prob, then bisect between the last two depths
+    low, high = 1, 2
+    while probability(high, q) > prob:
+        low, high = high, 2 * high
+    while high - low > 1:
+        middle = (low + high) // 2
+        if probability(middle, q) > prob:
+            low = middle
+        else:
+            high = middle
+    return high
+
+
+def confirmation_depth(q, prob, model="nakamoto"):
+    """
+    Smallest number of confirmations n with P(n, q) <= prob.
+
+    Every (q, prob) pair costs O(log n) evaluations of the closed form of the model and is cached, so repeated
+    queries are free.
+
+    :param q: hash share of the attacker, float or array
+    :param prob: accepted risk, float or array broadcast against q
+    :param model: nakamoto or grunspan
+    :return: float array of depths, inf for q >= 0.5 where the attacker always catches up
+    """
+    if model not in CLOSED_FORMS:
+        raise ValueError(f"unknown model {model}")
+    q, prob = np.broadcast_arrays(np.asarray(q, dtype=float), np.asarray(prob, dtype=float))
+    depths = [_depth(model, float(x), float(r)) for x, r in zip(q.ravel(), prob.ravel())]
+    return np.array(depths, dtype=float).reshape(q.shape)[()]
+
+
+def point_one_data(n_values=(1, 3, 6, 12, 24, 48), q_points=100) -> dict:
+    # the grid of the Monte Carlo results, so point_three reuses these tables
+    q_values = round_grid(np.linspace(0, 0.5, q_points))
+    # rows of the cached tables, one per n
+    return {"n": np.array(n_values), "q": q_values, "nakamoto": TABLES.get("nakamoto", n_values, q_values),
+            "grunspan": TABLES.get("grunspan", n_values, q_values)}
+
+
+def plot_point_one(data) -> dict:
+    ncols = min(3, len(data["n"]))
+    nrows = -(-len(data["n"]) // ncols)
+    fig, axes = plt.subplots(nrows=nrows, ncols=ncols, figsize=(4 * ncols, 4 * nrows), squeeze=False)
+
+    for i, (ax, n) in enumerate(zip(axes.flat, data["n"])):
+        ax.plot(data["q"], data["nakamoto"][i], label='Nakamoto')
+        ax.plot(data["q"], data["grunspan"][i], label='Grunspan')
         ax.set_xlabel('q')
         ax.set_ylabel('P(n, q)')
         ax.set_title(f'n = {n}')
         ax.legend()
         ax.grid()
 
-    plt.tight_layout()
-    plt.show()
-    plt.savefig("plot9.1.png")
+    fig.tight_layout()
+    return {"plot9.1": fig}
 
 
-def point_two():
-    prob_values = [0.001, 0.01, 0.1]
-    q_values = np.linspace(0, 0.5, 100)
-
-    fig, axes = plt.subplots(nrows=1, ncols=len(prob_values), figsize=(12, 4))
-
-    for i, ax in enumerate(axes):
-        prob = prob_values[i]
-        n_values_nakamoto = []
-        n_values_grunspan = []
-        for q in q_values:
-            n_nakamoto = 1
-            n_grunspan = 1
-            while P_Nakamoto(n_nakamoto, q) > prob:
-                n_nakamoto += 1
-            while P_Grunspan(n_grunspan, q) > prob:
-                n_grunspan += 1
-            n_values_nakamoto.append(n_nakamoto)
-            n_values_grunspan.append(n_grunspan)
-
-        ax.plot(q_values, n_values_nakamoto, label='Nakamoto')
-        ax.plot(q_values, n_values_grunspan, label='Grunspan')
+def point_one():
+    show(plot_point_one(point_one_data()))
+
+
+def point_two_data(prob_values=(0.001, 0.01, 0.1), q_points=100) -> dict:
+    q_values = np.linspace(0, 0.5, q_points)
+    # q = 0.5 has no finite depth and is left out of the plot
+    return {"prob": np.array(prob_values), "q": q_values,
+            "nakamoto": np.array([confirmation_depth(q_values, prob, "nakamoto") for prob in prob_values]),
+            "grunspan": np.array([confirmation_depth(q_values, prob, "grunspan") for prob in prob_values])}
+
+
+def plot_point_two(data) -> dict:
+    fig, axes = plt.subplots(nrows=1, ncols=len(data["prob"]), figsize=(12, 4), squeeze=False)
+
+    for i, ax in enumerate(axes.flat):
+        ax.plot(data["q"], data["nakamoto"][i], label='Nakamoto')
+        ax.plot(data["q"], data["grunspan"][i], label='Grunspan')
         ax.set_xlabel('q')
         ax.set_ylabel('n')
-        ax.set_title(f'P(n, q) = {prob}%')
+        ax.set_title(f'P(n, q) = {data["prob"][i]}%')
         ax.legend()
         ax.grid()
 
-    plt.tight_layout()
-    plt.show()
-    plt.savefig("plot9.2.png")
-
-
-def point_three():
-    # Set the project directory
-    project_dir = "./results"
+    fig.tight_layout()
+    return {"plot9.2": fig}
 
-    # Get a list of all files in the project directory
-    file_list = os.listdir(project_dir)
 
-    # Filter the files to include only CSV files matching the format "results{n}.csv"
-    csv_files = [file for file in file_list if file.startswith("results") and file.endswith(".csv")]
-    csv_files = sorted(csv_files, key=lambda x: int(re.search(r"results(\d+)", x).group(1)))
-
-    print(csv_files)
-    # Initialize an empty list to store the dataframes
-    # Initialize an empty dictionary to store the data
-    data_dict = []
-    names = []
+def point_two():
+    show(plot_point_two(point_two_data()))
 
-    # Read each CSV file into a dataframe and add it to the dictionary with the file name as the key
-    for file in csv_files:
-        pattern = r"results(\d+)\.csv"
-        match = re.match(pattern, file)
-        if match:
-            number = int(match.group(1))
 
-            file_path = os.path.join(project_dir, file)
-            df = pd.read_csv(file_path)
-            data_dict.append(df.values.tolist())
-            names.append(number)
+def point_three_data(store_dir="results/store", csv_dir="results") -> dict:
+    # Monte Carlo results come from the store, CSVs in csv_dir written since its last update replace them
+    store = ResultsStore(store_dir)
+    store.import_directory(csv_dir, newer=True)
+    data = {"n": np.array(store.ns())}
+    for n in store.ns():
+        q_values, probabilities = store.get(n, store.latest(n))
+        data[f"q_{n}"] = np.array(q_values)
+        data[f"monte_carlo_{n}"] = np.array(probabilities)
+        data[f"nakamoto_{n}"] = TABLES.get("nakamoto", n, q_values)
+        data[f"grunspan_{n}"] = TABLES.get("grunspan", n, q_values)
+    return data
 
-    # Now you have a list of dataframes containing the CSV data
-    reshaped_data = []
 
-    reshaped_data = [[[], []], [[], []], [[], []], [[], []], [[], []], [[], []]]
-    for i, d in enumerate(data_dict):
-        for j, k in enumerate(d):
-            reshaped_data[i][0].append(k[0])
-            reshaped_data[i][1].append(k[1])
-    fig, axes = plt.subplots(nrows=2, ncols=3, figsize=(12, 8))
+def plot_point_three(data) -> dict:
+    names = data["n"]
+    ncols = min(3, len(names))
+    nrows = -(-len(names) // ncols)
+    fig, axes = plt.subplots(nrows=nrows, ncols=ncols, figsize=(4 * ncols, 4 * nrows), squeeze=False)
 
-    q_values = np.linspace(0, 0.5, 100)
     # Flatten the axes array to easily iterate over it
-    for i, ax in enumerate(axes.flat):
-        data = reshaped_data[i]
-        prob_nak_vals = [P_Nakamoto(names[i], q) for q in q_values]
-        prob_gru_vals = [P_Grunspan(names[i], q) for q in q_values]
-
-        ax.plot(q_values, prob_nak_vals, label='Nakamoto')
-        ax.plot(q_values, prob_gru_vals, label='Grunspan')
-        ax.plot(data[0], data[1], label='Monte-Carlo')
+    for ax, n in zip(axes.flat, names):
+        q_values = data[f"q_{n}"]
+        ax.plot(q_values, data[f"nakamoto_{n}"], label='Nakamoto')
+        ax.plot(q_values, data[f"grunspan_{n}"], label='Grunspan')
+        ax.plot(q_values, data[f"monte_carlo_{n}"], label='Monte-Carlo')
         ax.set_xlabel('q')
         ax.set_ylabel('P(n, q)')
-        ax.set_title(f'n = {names[i]}')
+        ax.set_title(f'n = {n}')
         ax.legend()
         ax.grid()
+    for ax in list(axes.flat)[len(names):]:
+        ax.remove()
+
+    fig.tight_layout()
+    return {"plot9.3": fig}
+
+
+def point_three(store_dir="results/store", csv_dir="results"):
+    show(plot_point_three(point_three_data(store_dir, csv_dir)))
+
 
-    plt.tight_layout()
+def show(figures: dict):
+    # save before showing, plt.savefig after plt.show() writes an empty figure
+    for name, fig in figures.items():
+        fig.savefig(f"{name}.png")
     plt.show()
-    plt.savefig("plot9.3.png")
 
 
 if __name__ == "__main__":
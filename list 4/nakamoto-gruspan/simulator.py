@@ -0,0 +1,141 @@
+import argparse
+import os
+
+import numpy as np
+from scipy.stats import nbinom
+
+from store import ResultsStore, round_grid
+
+# the grid written to the CSVs, simulated and stored q values coincide
+Q_VALUES = round_grid(np.linspace(0, 0.5, 100))
+N_VALUES = [1, 3, 6, 12, 24, 48]
+
+
+def _histogram_race(n, q, trials, max_steps, rng):
+    """
+    Race of all trials at once, tracked as the number of trials at every deficit of the attacker.
+
+    The deficits after n honest blocks are a multinomial draw from the negative binomial distribution of attacker
+    blocks, every walk step splits the trials at a deficit binomially. This samples exactly the distribution of
+    independent trials while the cost depends only on n, the number of q values and max_steps, not on trials.
+    """
+    p = 1 - q
+    pmf = nbinom.pmf(np.arange(n)[None, :], n, p[:, None])
+    pmf /= np.maximum(1, pmf.sum(axis=1, keepdims=True))
+    # the last category, attacker already n blocks ahead, takes the rest of the probability
+    counts = rng.multinomial(trials, np.concatenate([pmf, np.zeros((len(q), 1))], axis=1))
+    wins = counts[:, n].copy()
+
+    # histogram[:, d] trials behind by d blocks, d = n - k for k attacker blocks
+    histogram = np.zeros((len(q), n + 2), dtype=np.int64)
+    histogram[:, 1:n + 1] = counts[:, n - 1::-1]
+    for step in range(max_steps):
+        # a trial further behind than the remaining steps cannot catch up before the cap
+        top = min(histogram.shape[1] - 1, max_steps - step)
+        live = histogram[:, 1:top + 1]
+        if not live.any():
+            break
+        down = rng.binomial(live, q[:, None])
+        up = live - down
+        wins += down[:, 0]
+        histogram = np.zeros((len(q), top + 2), dtype=np.int64)
+        histogram[:, 1:top] += down[:, 1:]
+        histogram[:, 2:top + 2] += up
+    return wins / trials
+
+
+def _trials_race(n, q, trials, max_steps, rng, batch_size=1 << 16):
+    """
+    Race of every trial simulated on its own, in batches of batch_size trials per q.
+    """
+    wins = np.zeros(len(q), dtype=np.int64)
+    for i, attacker in enumerate(q):
+        for start in range(0, trials, batch_size):
+            size = min(batch_size, trials - start)
+            deficit = n - rng.negative_binomial(n, 1 - attacker, size=size)
+            wins[i] += np.count_nonzero(deficit <= 0)
+            deficit = deficit[deficit > 0]
+            for step in range(max_steps):
+                if len(deficit) == 0:
+                    break
+                deficit += np.where(rng.random(len(deficit)) < attacker, -1, 1)
+                wins[i] += np.count_nonzero(deficit == 0)
+                deficit = deficit[(deficit > 0) & (deficit <= max_steps - step - 1)]
+    return wins / trials
+
+
+ENGINES = {"histogram": _histogram_race, "trials": _trials_race}
+
+
+def simulate(n: int, q_values=Q_VALUES, trials=1 << 20, max_steps=1000, engine="histogram", rng=None) -> np.ndarray:
+    """
+    Monte Carlo estimate of the probability that a double-spend attacker with hash share q succeeds after n
+    confirmations. While the honest miners find n blocks the attacker finds a negative binomial number of blocks,
+    then the attacker keeps mining and wins once it catches up; a walk still behind after max_steps blocks is lost.
+
+    :param n: number of confirmations
+    :param q_values: hash shares of the attacker
+    :param trials: number of races per q
+    :param max_steps: cap on the length of the catch-up walk
+    :param engine: histogram (cost independent of trials) or trials (every race simulated separately)
+    :param rng: numpy Generator
+    :return: estimated probability for every q
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"unknown engine {engine}")
+    rng = np.random.default_rng() if rng is None else rng
+    return ENGINES[engine](n, np.asarray(q_values, dtype=float), int(trials), max_steps, rng)
+
+
+def write_csv(path, q_values, probabilities):
+    """
+    Write "q,p" rows without a header, the format of results/results{n}.csv.
+    """
+    with open(path, "w") as file:
+        for q, probability in zip(q_values, probabilities):
+            file.write(f"{q:.8f}".rstrip("0").rstrip(".") + f",{float(probability)!r}\n")
+
+
+def simulate_to_csv(ns=N_VALUES, q_values=Q_VALUES, trials=1 << 20, max_steps=1000, engine="histogram", seed=None,
+                    directory="results"):
+    """
+    Simulate every n and write results{n}.csv into directory.
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    for n in ns:
+        probabilities = simulate(n, q_values, trials, max_steps, engine, rng)
+        write_csv(os.path.join(directory, f"results{n}.csv"), q_values, probabilities)
+        print(f"n = {n} done")
+
+
+def simulate_to_store(ns=N_VALUES, q_values=Q_VALUES, trials=1 << 20, max_steps=1000, engine="histogram", seed=None,
+                      store=None):
+    """
+    Simulate every n and append the results to a ResultsStore, merged with earlier runs of the same n and q grid.
+    """
+    store = ResultsStore() if store is None else store
+    rng = np.random.default_rng(seed)
+    for n in ns:
+        probabilities = simulate(n, q_values, trials, max_steps, engine, rng)
+        store.append(n, q_values, probabilities, trials, max_steps=max_steps, engine=engine)
+        print(f"n = {n} done")
+    return store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo simulation of the double-spend race")
+    parser.add_argument("--n", nargs="*", type=int, default=N_VALUES)
+    parser.add_argument("--log2-trials", type=int, default=20)
+    parser.add_argument("--max-steps", type=int, default=1000)
+    parser.add_argument("--engine", choices=list(ENGINES), default="histogram")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", default="results", help="directory of the results{n}.csv files")
+    parser.add_argument("--store", default=None, help="directory of a ResultsStore to append to instead of CSVs")
+    args = parser.parse_args()
+
+    if args.store is None:
+        simulate_to_csv(args.n, Q_VALUES, 1 << args.log2_trials, args.max_steps, args.engine, args.seed, args.output)
+    else:
+        simulate_to_store(args.n, Q_VALUES, 1 << args.log2_trials, args.max_steps, args.engine, args.seed,
+                          ResultsStore(args.store))
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import re
+import time
+
+import numpy as np
+
+
+# decimals of q written by simulator.write_csv
+Q_DECIMALS = 8
+
+
+def round_grid(q_values) -> np.ndarray:
+    """
+    :return: q_values rounded to the Q_DECIMALS decimals of the CSVs, so results read back from a CSV and results
+        appended directly share one q grid
+    """
+    return np.array([float(f"{q:.{Q_DECIMALS}f}") for q in np.asarray(q_values, dtype=np.float64).ravel()])
+
+
+def grid_id(q_values) -> str:
+    return hashlib.sha1(np.ascontiguousarray(q_values, dtype=np.float64).tobytes()).hexdigest()[:12]
+
+
+class ResultsStore:
+    """
+    Monte Carlo results as .npy columns next to an index.json.
+
+    Every q grid is stored once as grid_{id}.npy and the probabilities of every (n, q grid) as p_{n}_{id}.npy, so
+    loading memory-maps them instead of parsing text. Appending results of the same n, q grid and run parameters
+    merges them, weighting by the number of trials.
+    """
+
+    def __init__(self, directory="results/store"):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "index.json")
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as file:
+                self.index = json.load(file)
+        else:
+            self.index = {"grids": {}, "entries": {}}
+
+    def _save(self, name, array):
+        # write then rename, memory maps of the old file stay valid
+        path = os.path.join(self.directory, name)
+        with open(path + ".tmp", "wb") as file:
+            np.save(file, array)
+        os.replace(path + ".tmp", path)
+
+    def _save_index(self):
+        with open(self.index_path + ".tmp", "w") as file:
+            json.dump(self.index, file, indent=2)
+        os.replace(self.index_path + ".tmp", self.index_path)
+
+    def _load(self, name):
+        return np.load(os.path.join(self.directory, name), mmap_mode="r")
+
+    def _match_grid(self, q_values) -> str:
+        # a stored grid whose points lie within half a spacing of q_values is the same grid printed less precisely
+        tolerance = np.abs(np.diff(q_values)).min() / 2 if len(q_values) > 1 else 0.0
+        for grid, stored in self.index["grids"].items():
+            if stored["size"] == len(q_values) and np.abs(self._load(stored["file"]) - q_values).max() <= tolerance:
+                return grid
+        return grid_id(q_values)
+
+    def append(self, n: int, q_values, probabilities, trials=None, **meta):
+        """
+        :param n: number of confirmations
+        :param q_values: hash shares of the attacker
+        :param probabilities: estimated probability for every q
+        :param trials: number of races per q; results with known trials are merged, otherwise replaced
+        :param meta: other parameters of the run stored in the index, e.g. max_steps; a merge requires the same ones
+        """
+        q_values = round_grid(q_values)
+        probabilities = np.asarray(probabilities, dtype=np.float64).ravel()
+        if q_values.shape != probabilities.shape:
+            raise ValueError("q_values and probabilities differ in shape")
+        grid = self._match_grid(q_values)
+        if grid not in self.index["grids"]:
+            self._save(f"grid_{grid}.npy", q_values)
+            self.index["grids"][grid] = {"file": f"grid_{grid}.npy", "size": len(q_values)}
+
+        key = f"{n}/{grid}"
+        entry = self.index["entries"].get(key)
+        if entry is not None and entry["trials"] and trials:
+            # the source file name is provenance only, every other parameter changes what was estimated
+            stored = {k: v for k, v in entry.items() if k not in ("n", "grid", "file", "trials", "updated", "source")}
+            given = {k: v for k, v in meta.items() if k != "source"}
+            if stored != given:
+                raise ValueError(f"results for n = {n} were run with {stored}, cannot merge a run with {given}")
+            old = self._load(entry["file"])
+            probabilities = (old * entry["trials"] + probabilities * trials) / (entry["trials"] + trials)
+            trials += entry["trials"]
+        self._save(f"p_{n}_{grid}.npy", probabilities)
+        self.index["entries"][key] = {"n": int(n), "grid": grid, "file": f"p_{n}_{grid}.npy", "trials": trials,
+                                      "updated": time.time(), **meta}
+        self._save_index()
+
+    def grids(self) -> list:
+        return list(self.index["grids"])
+
+    def ns(self, grid=None) -> list:
+        """
+        :return: sorted n values with results, on the q grid id grid or on any grid
+        """
+        return sorted({e["n"] for e in self.index["entries"].values() if grid is None or e["grid"] == grid})
+
+    def latest(self, n: int) -> str:
+        """
+        :return: q grid id of the most recently appended results of n
+        """
+        entries = [e for e in self.index["entries"].values() if e["n"] == n]
+        if not entries:
+            raise KeyError(f"no results for n = {n}")
+        return max(entries, key=lambda e: e.get("updated", 0))["grid"]
+
+    def modified(self) -> float:
+        """
+        :return: time the index was last written, 0 for a new store
+        """
+        return os.path.getmtime(self.index_path) if os.path.exists(self.index_path) else 0.0
+
+    def get(self, n: int, grid=None):
+        """
+        :param n: number of confirmations
+        :param grid: q grid id, the only grid of n by default
+        :return: memory-mapped arrays q_values and probabilities
+        """
+        entries = [e for e in self.index["entries"].values() if e["n"] == n and (grid is None or e["grid"] == grid)]
+        if len(entries) != 1:
+            raise KeyError(f"{len(entries)} results for n = {n}, pass the q grid id")
+        entry = entries[0]
+        return self._load(self.index["grids"][entry["grid"]]["file"]), self._load(entry["file"])
+
+    def import_csv(self, path, n: int, trials=None):
+        """
+        Add a header-less "q,p" CSV as written by simulator.write_csv.
+        """
+        data = np.loadtxt(path, delimiter=",", ndmin=2)
+        self.append(n, data[:, 0], data[:, 1], trials, source=os.path.basename(path))
+
+    def import_directory(self, directory="results", trials=None, newer=False):
+        """
+        Add every results{n}.csv of directory.
+
+        :param newer: only the files modified after the store was last written
+        """
+        since = self.modified() if newer else None
+        for name in os.listdir(directory):
+            match = re.fullmatch(r"results(\d+)\.csv", name)
+            if match and (since is None or os.path.getmtime(os.path.join(directory, name)) > since):
+                self.import_csv(os.path.join(directory, name), int(match.group(1)), trials)
+
+    def __len__(self):
+        return len(self.index["entries"])
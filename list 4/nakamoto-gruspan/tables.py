@@ -0,0 +1,72 @@
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from store import grid_id
+
+# part of the persisted file names, raise it whenever a model function changes so that stale tables are not read
+VERSION = 1
+
+
+class ProbabilityCache:
+    """
+    Bounded LRU cache of probability tables, one per (model, q grid) with a row for every n = 1..n_max computed so
+    far. Asking for a larger n only computes the missing rows, and with a directory the tables are kept on disk
+    between runs.
+    """
+
+    def __init__(self, models: dict, maxsize=16, directory=None):
+        """
+        :param models: dictionary model -> function P(n, q) vectorized over an (n, 1) column and a q row
+        :param maxsize: number of tables kept in memory
+        :param directory: where tables are persisted, None keeps them only in memory
+        """
+        self.models = models
+        self.maxsize = maxsize
+        self.directory = directory
+        self._tables = OrderedDict()
+
+    def _path(self, model, grid):
+        return os.path.join(self.directory, f"{model}_{grid}_v{VERSION}.npy")
+
+    def table(self, model: str, n_max: int, q_values) -> np.ndarray:
+        """
+        :return: array of shape (at least n_max, len(q_values)), row i holds P(i + 1, q)
+        """
+        if model not in self.models:
+            raise ValueError(f"unknown model {model}")
+        q_values = np.asarray(q_values, dtype=float)
+        key = (model, grid_id(q_values))
+        table = self._tables.pop(key, None)
+        if table is None and self.directory is not None and os.path.exists(self._path(*key)):
+            table = np.load(self._path(*key))
+        if table is None:
+            table = np.zeros((0, len(q_values)))
+
+        if len(table) < n_max:
+            ns = np.arange(len(table) + 1, n_max + 1)
+            table = np.concatenate([table, self.models[model](ns[:, None], q_values)])
+            if self.directory is not None:
+                os.makedirs(self.directory, exist_ok=True)
+                np.save(self._path(*key), table)
+
+        self._tables[key] = table
+        while len(self._tables) > self.maxsize:
+            self._tables.popitem(last=False)
+        return table
+
+    def get(self, model: str, n, q_values) -> np.ndarray:
+        """
+        :param model: name of the model
+        :param n: number of confirmations, int or sequence
+        :param q_values: hash shares of the attacker
+        :return: P(n, q) of shape (len(q_values),) for an int n, otherwise (len(n), len(q_values))
+        """
+        rows = np.asarray(n, dtype=np.int64)
+        if np.any(rows < 1):
+            raise ValueError("n must be at least 1")
+        return self.table(model, int(rows.max()), q_values)[rows - 1]
+
+    def clear(self):
+        self._tables.clear()
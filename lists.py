@@ -0,0 +1,21 @@
+import importlib
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def load(directory: str, name: str):
+    """
+    Import module name from one of the list directories. Their scripts import siblings by bare name and several
+    share a name (main), so the modules of the directory are dropped from sys.modules before importing.
+    """
+    path = os.path.join(ROOT, directory)
+    for file in os.listdir(path):
+        if file.endswith(".py"):
+            sys.modules.pop(file[:-3], None)
+    sys.path.insert(0, path)
+    try:
+        return importlib.import_module(name)
+    finally:
+        sys.path.remove(path)
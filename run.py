@@ -0,0 +1,150 @@
+import argparse
+import inspect
+import json
+import os
+import random
+import time
+
+import matplotlib
+
+# no display is needed for any stage
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+from lists import ROOT, load
+
+# name -> (directory, module, function computing the raw results, function plotting them or None)
+EXPERIMENTS = {
+    "list1/task2": ("list 1", "task2", "task2_data", "plot_task2"),
+    "list1/task3": ("list 1", "task3", "task3_data", "plot_task3"),
+    "list1/task3_adaptive": ("list 1", "task3", "task3_adaptive_data", None),
+    "list1/task4": ("list 1", "task4", "task4_data", "plot_task4"),
+    "list1/task4_adaptive": ("list 1", "task4", "task4_adaptive_data", None),
+    "list2/task2": ("list 2", "main", "task2_data", "plot_task2"),
+    "list2/task5_a": ("list 2", "mincount", "task5_a_data", "plot_task5_a"),
+    "list2/task5_b": ("list 2", "mincount", "task5_b_data", "plot_task5_b"),
+    "list2/task5_c": ("list 2", "mincount", "task5_c_data", "plot_task5_c"),
+    "list2/task6": ("list 2", "mincount", "task6_data", "plot_task6"),
+    "list2/task7": ("list 2", "mincount", "task7_data", "plot_task7"),
+    "list4/point_one": ("list 4/nakamoto-gruspan", "main", "point_one_data", "plot_point_one"),
+    "list4/point_two": ("list 4/nakamoto-gruspan", "main", "point_two_data", "plot_point_two"),
+    "list4/point_three": ("list 4/nakamoto-gruspan", "main", "point_three_data", "plot_point_three"),
+}
+
+
+def parse_params(pairs) -> dict:
+    """
+    :param pairs: strings key=value, values are read as JSON and kept as strings otherwise
+    """
+    params = dict()
+    for pair in pairs or []:
+        key, _, value = pair.partition("=")
+        try:
+            params[key] = json.loads(value)
+        except json.JSONDecodeError:
+            params[key] = value
+    return params
+
+
+def result_dir(name: str, output: str) -> str:
+    return os.path.abspath(os.path.join(output, name))
+
+
+def run_experiment(name: str, params=None, workers=None, seed=None, output="output") -> str:
+    """
+    Compute the raw results of an experiment and store them as results.npz with the parameters in meta.json.
+
+    :param name: key of EXPERIMENTS
+    :param params: keyword arguments of the data function
+    :param workers: number of processes, passed on when the experiment takes it
+    :param seed: seed of random and np.random, passed on when the experiment takes it
+    :param output: root directory of the results
+    :return: directory of the results
+    """
+    directory, module, data_function, _ = EXPERIMENTS[name]
+    function = getattr(load(directory, module), data_function)
+    accepted = inspect.signature(function).parameters
+    kwargs = dict(params or {})
+    unknown = set(kwargs) - set(accepted)
+    if unknown:
+        raise ValueError(f"{name} does not take {sorted(unknown)}, its parameters are {list(accepted)}")
+    for key, value in [("workers", workers), ("seed", seed)]:
+        if value is not None and key in accepted:
+            kwargs[key] = value
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)
+
+    target = result_dir(name, output)
+    os.makedirs(target, exist_ok=True)
+    cwd = os.getcwd()
+    # the scripts read and write paths relative to their own directory
+    os.chdir(os.path.join(ROOT, directory))
+    try:
+        start = time.perf_counter()
+        data = function(**kwargs)
+        seconds = time.perf_counter() - start
+    finally:
+        os.chdir(cwd)
+
+    np.savez(os.path.join(target, "results.npz"), **{key: np.asarray(value) for key, value in data.items()})
+    meta = {"experiment": name, "params": kwargs, "workers": workers, "seed": seed, "seconds": seconds,
+            "finished": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    with open(os.path.join(target, "meta.json"), "w") as file:
+        json.dump(meta, file, indent=2, default=str)
+    return target
+
+
+def plot_experiment(name: str, output="output") -> list:
+    """
+    Render the figures of stored results into PNGs next to them, without running the experiment again.
+
+    :return: paths of the written figures
+    """
+    directory, module, _, plot_function = EXPERIMENTS[name]
+    if plot_function is None:
+        return []
+    target = result_dir(name, output)
+    with np.load(os.path.join(target, "results.npz")) as stored:
+        data = {key: stored[key][()] if stored[key].ndim == 0 else stored[key] for key in stored.files}
+    figures = getattr(load(directory, module), plot_function)(data)
+    if isinstance(figures, list):
+        figures = {f"figure {i + 1}": fig for i, fig in enumerate(figures)}
+    paths = []
+    for title, fig in figures.items():
+        paths.append(os.path.join(target, f"{title}.png"))
+        fig.savefig(paths[-1])
+        plt.close(fig)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the experiments of all lists without a display")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="list the experiments and their parameters")
+    run_parser = commands.add_parser("run", help="compute and store the raw results of an experiment")
+    run_parser.add_argument("name", choices=list(EXPERIMENTS))
+    run_parser.add_argument("--param", nargs="*", default=[], metavar="KEY=VALUE")
+    run_parser.add_argument("--workers", type=int, default=None)
+    run_parser.add_argument("--seed", type=int, default=None)
+    run_parser.add_argument("--output", default="output")
+    run_parser.add_argument("--plot", action="store_true", help="render the figures right after the run")
+    plot_parser = commands.add_parser("plot", help="render the figures of stored results")
+    plot_parser.add_argument("name", choices=list(EXPERIMENTS))
+    plot_parser.add_argument("--output", default="output")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for name, (directory, module, data_function, _) in EXPERIMENTS.items():
+            function = getattr(load(directory, module), data_function)
+            print(f"{name}{inspect.signature(function)}")
+    elif args.command == "run":
+        print(f"results in {run_experiment(args.name, parse_params(args.param), args.workers, args.seed, args.output)}")
+        if args.plot:
+            for path in plot_experiment(args.name, args.output):
+                print(f"figure {path}")
+    else:
+        for path in plot_experiment(args.name, args.output):
+            print(f"figure {path}")